@@ -1,198 +1,153 @@
 import streamlit as st
 import pandas as pd
-import openpyxl
 from io import BytesIO
 import base64
-import glob
 import os
 import json
+import zipfile
+import importlib.util
 
-# --- Default Configuration ---
-DEFAULT_MAPPING_RULES = {
-    "Service of Unit": ["I8"],
-    "Item No.": ["AV8"],
-    "Size": [ ["E9", "M9", "N9"] ], 
-    "Type": ["Y9", "V49"], 
-    "Surf/Unit (Gross/Eff)": [ ["K10", "O10", "P10"] ],
-    "Fluid Name": ["T13", "AR13"], 
-    "Fluid Quantity, Total": ["T14", "AR14"],
-    "Temperature (In/Out)": [ 
-        {"action": "vertical", "cells": ["T20", "AF20"]}, 
-        {"action": "vertical", "cells": ["AR20", "BD20"]} 
-    ],
-    "Inlet Pressure": ["AB28", "AZ28"],
-    "Velocity": ["AB29", "AZ29"],
-    "Pressure Drop, Allow/Calc": [ 
-        {"action": "vertical", "cells": ["T30", "AF30"]}, 
-        {"action": "vertical", "cells": ["AR30", "BD30"]} 
-    ],
-    "Heat Exchanged": ["M32"],
-    "MTD (Corrected)": ["BB32"],
-    "Transfer Rate, Service": ["M33"],
-    "Clean": ["AH33"],
-    "Actual": ["BB33"],
-    "Design/Test Pressure": ["T36"],
-    "Design Temperature": ["T37"],
-    "No Passes per Shell": ["T38"],
-    "Tube No.": ["F43"],
-    "OD": ["N43", "AC45"], 
-    "Thk(Avg)": ["AC43"],
-    "Length": ["AR43"],
-    "Pitch": ["BG43"],
-    "Tube Type": ["F44"],
-    "Material": ["AH44"],
-    "Tube pattern": ["BM44"],
-    "Shell": ["E45"],
-    "ID": ["U45"],
-    "Shell Cover": ["AU45"],
-    "Channel or Bonnet": ["K46"],
-    "Channel Cover": ["AU46"],
-    "Tubesheet-Stationary": ["K47"],
-    "Tubesheet-Floating": ["AW47"],
-    "Floating Head Cover": ["K48"],
-    "Impingement Plate": ["AW48"],
-    "Baffles-Cross": ["H49"],
-    "%Cut (Diam)": ["AM49"],
-    "Spacing(c/c)": ["AX49"],
-    "Inlet": ["BG49"],
-    "TEMA Class": ["BA57"]
-}
+from engine import (
+    CHECKPOINT_DIR,
+    CHUNK_SHEETS,
+    DEFAULT_MAPPING_RULES,
+    JobQueue,
+    RuleSet,
+    RuleStore,
+    SpooledUpload,
+    compare_revisions,
+    df_to_rules,
+    diff_matrix,
+    export_table,
+    extract_table,
+    find_registry_file,
+    find_template_file,
+    load_registry,
+    new_output,
+    process_excel,
+    process_layouts,
+    read_input_source,
+    read_sheet_names,
+    result_cache,
+    rules_to_df,
+    validate_rules,
+)
 
-# --- Helper Functions ---
+# --- Main App ---
 
-def rules_to_df(rules_dict):
-    """Convert mapping rules dict to a flat DataFrame for editing."""
-    rows = []
-    for label, rule_list in rules_dict.items():
-        for idx, rule in enumerate(rule_list):
-            row = {
-                "Label": label,
-                "Order": idx + 1,
-                "Type": "Single",
-                "Cells": ""
-            }
-            
-            if isinstance(rule, list):
-                row["Type"] = "Merge"
-                row["Cells"] = ", ".join(rule)
-            elif isinstance(rule, dict) and rule.get("action") == "vertical":
-                row["Type"] = "Vertical"
-                row["Cells"] = ", ".join(rule["cells"])
-            else:
-                row["Type"] = "Single"
-                row["Cells"] = str(rule)
-            
-            rows.append(row)
-    
-    return pd.DataFrame(rows)
+def show_diagnostics(job):
+    """Render the JobStats dict of the last job."""
+    with st.expander("🔍 Diagnostics", expanded=True):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total Time", f"{job['total_seconds']:.2f} s")
+        c2.metric("Cells Read / Written", f"{job['cells_read']} / {job['cells_written']}")
+        c3.metric("Input Size", f"{job['input_bytes'] / 1024:.0f} KB" if job["input_bytes"] else "-")
+        c4.metric("Server Peak Memory", f"{job['peak_rss_mb']:.0f} MB" if job["peak_rss_mb"] else "-",
+                  help="Highest memory use of the app process since it started, across all jobs")
+        if job["cache"]:
+            st.caption(f"Result cache: {job['cache']}")
 
-def df_to_rules(df):
-    """Convert edited DataFrame back to mapping rules dict."""
-    rules_dict = {}
-    
-    # Sort by Label and Order to ensure correct list order
-    df = df.sort_values(by=["Label", "Order"])
-    
-    for _, row in df.iterrows():
-        label = row["Label"]
-        rtype = row["Type"]
-        cells_str = row["Cells"]
-        
-        # Parse cells
-        cells = [c.strip() for c in cells_str.split(",") if c.strip()]
-        
-        if not cells:
-            continue
-            
-        rule = None
-        if rtype == "Merge":
-            rule = cells
-        elif rtype == "Vertical":
-            rule = {"action": "vertical", "cells": cells}
-        else: # Single
-            rule = cells[0]
-            
-        if label not in rules_dict:
-            rules_dict[label] = []
-        
-        rules_dict[label].append(rule)
-        
-    return rules_dict
+        st.markdown("**Phases**")
+        st.dataframe(pd.DataFrame(list(job["phases"].items()), columns=["Phase", "Seconds"]), hide_index=True)
+        if job["sheets"]:
+            st.markdown("**Sheets**")
+            st.dataframe(pd.DataFrame(job["sheets"]), hide_index=True)
+        if job["errors"]:
+            st.warning(f"{len(job['errors'])} mapping errors")
+            st.dataframe(pd.DataFrame(job["errors"]), hide_index=True)
+        if job.get("warnings"):
+            st.markdown("**Template / Rule Warnings**")
+            st.dataframe(pd.DataFrame({"Warning": job["warnings"]}), hide_index=True)
 
-def find_template_file():
-    if os.path.exists("template.xlsx"): return "template.xlsx"
-    for file in os.listdir():
-        if file.lower() == "template.xlsx": return file
-    xlsx_files = [f for f in os.listdir() if f.endswith(".xlsx")]
-    ignore_list = ["processed_output.xlsx", "dummy_input.xlsx", "dummy_template.xlsx"]
-    candidates = [f for f in xlsx_files if f not in ignore_list and not f.startswith("dummy_") and not f.startswith("~$")]
-    return candidates[0] if candidates else None
+        st.download_button(
+            label="Download Diagnostics (JSON)",
+            data=json.dumps(job, indent=4, ensure_ascii=False),
+            file_name="diagnostics.json",
+            mime="application/json"
+        )
 
-def get_cell_value(sheet, addr):
-    val = sheet[addr].value
-    return str(val) if val is not None else ""
+def extract_table_file(input_file, mapping_rules, fmt, engine="standard", cache=None, stats=None, typed=False):
+    """Extract the mapped values and export them as a CSV or Parquet file in memory."""
+    table = extract_table(input_file, mapping_rules, engine=engine, cache=cache, stats=stats, typed=typed)
+    result_file = new_output()
+    export_table(table, result_file, fmt)
+    result_file.seek(0)
+    return result_file
 
-def process_excel(input_file, template_file, mapping_rules):
-    template_wb = openpyxl.load_workbook(template_file)
-    template_sheet = template_wb.active
-    
-    input_wb = openpyxl.load_workbook(input_file, data_only=True)
-    input_sheet_names = input_wb.sheetnames
-    
-    for i, sheet_name in enumerate(input_sheet_names):
-        input_sheet = input_wb[sheet_name]
-        target_col_idx = 3 + i
-        template_sheet.cell(row=1, column=target_col_idx).value = i + 1
-        
-        duplicate_counters = {key: 0 for key in mapping_rules}
-        
-        for row_idx in range(2, 150):
-            label_cell = template_sheet.cell(row=row_idx, column=1)
-            label = label_cell.value
-            
-            if label:
-                label = str(label).strip()
-                if label in mapping_rules:
-                    rules = mapping_rules[label]
-                    counter = duplicate_counters[label]
-                    
-                    if counter < len(rules):
-                        rule = rules[counter]
-                        try:
-                            if isinstance(rule, dict) and rule.get("action") == "vertical":
-                                cells = rule["cells"]
-                                val1 = get_cell_value(input_sheet, cells[0])
-                                template_sheet.cell(row=row_idx, column=target_col_idx).value = val1
-                                if len(cells) > 1:
-                                    val2 = get_cell_value(input_sheet, cells[1])
-                                    template_sheet.cell(row=row_idx + 1, column=target_col_idx).value = val2
-                            elif isinstance(rule, list):
-                                values = [get_cell_value(input_sheet, addr) for addr in rule]
-                                merged_value = " ".join([v for v in values if v])
-                                template_sheet.cell(row=row_idx, column=target_col_idx).value = merged_value
-                            else:
-                                val = get_cell_value(input_sheet, rule)
-                                template_sheet.cell(row=row_idx, column=target_col_idx).value = val
-                        except Exception as e:
-                            print(f"Error processing {label}: {e}")
-                        duplicate_counters[label] += 1
+def process_layouts_file(input_file, registry, engine="standard", stats=None):
+    """Fill every matching layout's template and zip the outputs, one workbook per layout."""
+    outputs, unmatched = process_layouts(input_file, registry, engine=engine, stats=stats)
+    result_file = new_output()
+    with zipfile.ZipFile(result_file, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, output in outputs.items():
+            archive.writestr(f"processed_output_{name}.xlsx", output.getvalue())
+        if unmatched:
+            archive.writestr("unmatched_sheets.txt", "\n".join(unmatched) + "\n")
+    result_file.seek(0)
+    return result_file
 
-    output = BytesIO()
-    template_wb.save(output)
-    output.seek(0)
-    return output
+def show_jobs(session_jobs, active, diagnostics):
+    """List this session's background jobs with their progress, results and errors."""
+    st.markdown("#### Jobs")
+    still_active = False
+    for entry in reversed(session_jobs):
+        job = job_queue.get(entry["id"])
+        if job is None:
+            continue
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            st.progress(job.progress, text=f"{job.name}: {job.status}")
+        with c2:
+            if job.status == "done":
+                st.download_button(
+                    label="Download Result",
+                    data=job.result.getvalue,
+                    file_name=entry["file_name"],
+                    mime=entry["mime"],
+                    key=f"download_{job.id}"
+                )
+            elif not job.finished:
+                still_active = True
+                if st.button("Cancel", key=f"cancel_{job.id}"):
+                    job_queue.cancel(job.id)
+        if job.status == "failed":
+            st.error(f"An error occurred: {job.error}")
+        if job.status in ("failed", "cancelled") and job.sheets_checkpointed:
+            st.caption(f"{job.sheets_checkpointed} sheets were saved; "
+                       "processing the same files again resumes from there.")
+        if diagnostics and job.stats and entry is session_jobs[-1]:
+            show_diagnostics(job.stats)
 
-# --- Main App ---
+    if active and not still_active:
+        # Stop polling once every job of this session has finished
+        st.rerun()
+
+@st.cache_resource
+def get_job_queue():
+    """One job queue shared by every session on this server."""
+    return JobQueue()
+
+@st.cache_resource
+def get_rule_store():
+    """One rule set store shared by every session, so compiled plans are shared too."""
+    return RuleStore()
 
 st.set_page_config(page_title="Excel Auto-Filler", layout="wide")
 st.title("Excel Data Automation App")
 
+job_queue = get_job_queue()
+rule_store = get_rule_store()
+
 # Initialize Session State
 if "mapping_rules" not in st.session_state:
-    st.session_state.mapping_rules = DEFAULT_MAPPING_RULES
+    # Start from the most recently saved rule set
+    latest = rule_store.latest()
+    st.session_state.mapping_rules = latest if latest is not None else DEFAULT_MAPPING_RULES
+if "jobs" not in st.session_state:
+    st.session_state.jobs = []
 
 # Tabs
-tab1, tab2 = st.tabs(["📂 Data Processing", "⚙️ Mapping Settings"])
+tab1, tab2, tab3 = st.tabs(["📂 Data Processing", "⚙️ Mapping Settings", "🔀 Compare Revisions"])
 
 # --- Tab 1: Processing ---
 with tab1:
@@ -211,21 +166,72 @@ with tab1:
             template_file = st.file_uploader("2. Upload Template File (Form)", type=['xlsx'])
             st.warning("No template file found. Please upload one.")
 
-    if input_file and template_file:
+    low_memory = st.checkbox("Low-memory mode (stream input, recommended for large workbooks)")
+    output_formats = ["Filled Template (xlsx)", "One Sheet per Input (xlsx)", "Data Table (CSV)"]
+    if importlib.util.find_spec("pyarrow") is not None:  # Parquet needs pyarrow
+        output_formats.append("Data Table (Parquet)")
+    output_format = st.radio("Output", output_formats, horizontal=True)
+    registry_file = find_registry_file()
+    detect_layouts = False
+    if registry_file and output_format == "Filled Template (xlsx)":
+        detect_layouts = st.checkbox(f"Detect layout per sheet (templates from {registry_file})")
+    typed = False
+    if output_format.startswith("Data Table"):
+        typed = st.checkbox("Typed columns (split merged cells, parse numbers and units)")
+    fills_template = output_format in ("Filled Template (xlsx)", "One Sheet per Input (xlsx)")
+    needs_template = fills_template and not detect_layouts
+    diagnostics = st.checkbox("Show diagnostics")
+
+    if input_file and (template_file or not needs_template):
         if st.button("Process Excel Files", type="primary"):
+            upload = SpooledUpload(input_file)
             try:
-                with st.spinner("Processing..."):
-                    result_file = process_excel(input_file, template_file, st.session_state.mapping_rules)
-                st.success("Processing Complete!")
-                st.download_button(
-                    label="Download Result Excel",
-                    data=result_file,
-                    file_name="processed_output.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                engine = "streaming" if low_memory else "standard"
+                total_sheets = len(read_sheet_names(read_input_source(upload.file)))
+                if detect_layouts:
+                    job = job_queue.submit(
+                        process_layouts_file, upload.file, load_registry(registry_file),
+                        engine=engine,
+                        name=input_file.name, total_sheets=total_sheets, cleanup=upload.close
+                    )
+                    file_name = "processed_outputs.zip"
+                    mime = "application/zip"
+                elif needs_template:
+                    if not isinstance(template_file, str):
+                        template_file = BytesIO(template_file.getvalue())
+                    layout = "sheets" if output_format == "One Sheet per Input (xlsx)" else "columns"
+                    chunked = {}
+                    if low_memory and layout == "columns":
+                        # Checkpointed, so processing the same files again resumes a failed run;
+                        # the fast writer patches the values in without building the workbook
+                        chunked = {"chunk_size": CHUNK_SHEETS, "checkpoint_dir": CHECKPOINT_DIR, "writer": "fast"}
+                    job = job_queue.submit(
+                        process_excel, upload.file, template_file, st.session_state.mapping_rules,
+                        engine=engine, cache=result_cache, layout=layout, **chunked,
+                        name=input_file.name, total_sheets=total_sheets, cleanup=upload.close
+                    )
+                    file_name = "processed_output.xlsx"
+                    mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                else:
+                    fmt = "csv" if output_format == "Data Table (CSV)" else "parquet"
+                    job = job_queue.submit(
+                        extract_table_file, upload.file, st.session_state.mapping_rules, fmt,
+                        engine=engine, cache=result_cache, typed=typed,
+                        name=input_file.name, total_sheets=total_sheets, cleanup=upload.close
+                    )
+                    file_name = f"extracted_data.{fmt}"
+                    mime = "text/csv" if fmt == "csv" else "application/octet-stream"
+                st.session_state.jobs.append({"id": job.id, "file_name": file_name, "mime": mime})
             except Exception as e:
+                upload.close()
                 st.error(f"An error occurred: {e}")
 
+    session_jobs = [entry for entry in st.session_state.jobs if job_queue.get(entry["id"])]
+    st.session_state.jobs = session_jobs
+    active = any(not job_queue.get(entry["id"]).finished for entry in session_jobs)
+    if session_jobs:
+        st.fragment(run_every=1 if active else None)(show_jobs)(session_jobs, active, diagnostics)
+
 # --- Tab 2: Settings ---
 with tab2:
     st.markdown("### ⚙️ Configure Mapping Rules")
@@ -288,7 +294,7 @@ with tab2:
     uploaded_config = st.file_uploader("Load Settings (JSON)", type=['json'])
     if uploaded_config:
         try:
-            loaded_rules = json.load(uploaded_config)
+            loaded_rules = validate_rules(json.load(uploaded_config))
             if st.button("Apply Loaded Settings"):
                 st.session_state.mapping_rules = loaded_rules
                 st.success("Settings loaded successfully! The table above will update on next interaction.")
@@ -296,6 +302,70 @@ with tab2:
         except Exception as e:
             st.error(f"Error loading JSON: {e}")
 
+    st.markdown("---")
+    st.markdown("### 🗄️ Saved Rule Sets")
+    current = st.session_state.mapping_rules
+    st.caption(f"In use: {current.label}" if isinstance(current, RuleSet) else "In use: unsaved rules")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        save_name = st.text_input("Name", value=current.name if isinstance(current, RuleSet) else "")
+        save_note = st.text_input("Note (optional)")
+        if st.button("Save as New Version"):
+            try:
+                st.session_state.mapping_rules = rule_store.save(save_name, current, note=save_note)
+                st.success(f"Saved {st.session_state.mapping_rules.label}.")
+            except Exception as e:
+                st.error(f"Error saving rule set: {e}")
+    with col2:
+        names = rule_store.names()
+        if names:
+            load_name = st.selectbox("Rule set", names)
+            versions = rule_store.versions(load_name)
+            load_version = st.selectbox(
+                "Version", [v["version"] for v in versions],
+                format_func=lambda n: next(f"v{v['version']}" + (f" - {v['note']}" if v["note"] else "")
+                                           for v in versions if v["version"] == n)
+            )
+            if st.button("Load Rule Set"):
+                st.session_state.mapping_rules = rule_store.load(load_name, load_version)
+                st.rerun()
+        else:
+            st.info("No saved rule sets yet.")
+
+# --- Tab 3: Compare Revisions ---
+with tab3:
+    st.markdown("### Compare Revisions")
+    st.caption("Upload two or more revisions of the same workbook (e.g. rev A/B/C). "
+               "Sheets are matched by Item No. and compared label by label.")
+    revision_files = st.file_uploader("Revisions (in order)", type=['xlsx'], accept_multiple_files=True)
+    if revision_files and len(revision_files) >= 2 and st.button("Compare", type="primary"):
+        uploads = [SpooledUpload(f) for f in revision_files]
+        try:
+            with st.spinner("Comparing..."):
+                st.session_state.revision_diff = compare_revisions(
+                    [upload.file for upload in uploads], st.session_state.mapping_rules,
+                    names=[f.name for f in revision_files], engine="streaming", cache=result_cache
+                )
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+        finally:
+            for upload in uploads:
+                upload.close()
+    report = st.session_state.get("revision_diff")
+    if report is not None:
+        changed = report[report["Changed"]]
+        st.metric("Items Changed", f"{changed['Item No.'].nunique()} / {report['Item No.'].nunique()}")
+        matrix = diff_matrix(report)
+        st.dataframe(matrix.loc[matrix.any(axis=1), matrix.any(axis=0)], use_container_width=True)
+        st.dataframe(changed, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Download Diff (CSV)",
+            data=lambda: report.to_csv(index=False),
+            file_name="revision_diff.csv",
+            mime="text/csv"
+        )
+
 # --- Sidebar Tools ---
 with st.sidebar.expander("Developer Tools"):
     st.write("Current Directory:", os.getcwd())
@@ -0,0 +1,170 @@
+"""
+Batch mode: fill one template from many input workbooks in a single run.
+
+Usage:
+    python batch.py INPUT [INPUT ...] [--template template.xlsx] [--out-dir out]
+    python batch.py "datasheets/*.xlsx" --combined all_datasheets.xlsx
+
+Each INPUT may be a workbook, a directory of workbooks or a glob pattern.
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+
+from engine import (
+    SPOOL_CHUNK_BYTES,
+    compile_mapping_plan,
+    find_template_file,
+    iter_sheet_values,
+    load_rules,
+    load_template,
+    read_template_bytes,
+    write_output,
+)
+
+
+def find_input_files(patterns):
+    """Expand files, directories and glob patterns into a sorted list of workbooks."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.xlsx"))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = glob.glob(pattern)
+        files.extend(sorted(f for f in matches if not os.path.basename(f).startswith("~$")))
+
+    unique = []
+    for f in files:
+        if f not in unique:
+            unique.append(f)
+    return unique
+
+
+def output_name(input_path):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return f"{stem}_processed.xlsx"
+
+
+def output_names(input_files):
+    """
+    Map each input to a distinct output file name.
+
+    Inputs from different directories may share a base name; the second
+    and later ones get a numeric suffix (x_processed.xlsx, x_2_processed.xlsx)
+    instead of overwriting the first. Names are compared case-insensitively.
+    """
+    names = {}
+    taken = set()
+    for input_path in input_files:
+        name = output_name(input_path)
+        stem = name[:-len("_processed.xlsx")]
+        n = 1
+        while name.casefold() in taken:
+            n += 1
+            name = f"{stem}_{n}_processed.xlsx"
+        taken.add(name.casefold())
+        names[input_path] = name
+    return names
+
+
+def write_file(path, output):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(output, f, SPOOL_CHUNK_BYTES)
+
+
+def process_batch(input_files, template_file, mapping_rules, output_dir=".", combined=None,
+                  engine="standard", workers=1, writer="openpyxl"):
+    """
+    Process many input workbooks against one template.
+
+    The template is parsed and its mapping plan compiled once; per-input
+    outputs get a copy from the template cache. By default one output
+    workbook is written per input into output_dir (see output_names for
+    inputs sharing a name); with combined set to a
+    path, every input's sheets are appended as columns of one workbook.
+    writer="fast" patches the template package instead of saving through
+    openpyxl. Returns one report dict per input with its timing and any error.
+    """
+    template_wb = load_template(template_file)
+    plan = compile_mapping_plan(template_wb.active, mapping_rules)
+    template_source = read_template_bytes(template_file) if writer == "fast" else template_file
+    combined_values = []
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    reports = []
+    names = output_names(input_files)
+    for input_path in input_files:
+        report = {"input": input_path, "output": None, "sheets": 0, "seconds": 0.0, "error": None}
+        start_time = time.perf_counter()
+        try:
+            sheet_values = list(iter_sheet_values(input_path, plan, engine, workers))
+            report["sheets"] = len(sheet_values)
+            if combined:
+                combined_values.extend(sheet_values)
+                report["output"] = combined
+            else:
+                report["output"] = os.path.join(output_dir, names[input_path])
+                job_wb = load_template(template_file) if writer != "fast" else None
+                write_file(report["output"], write_output(job_wb, template_source, sheet_values, writer))
+        except Exception as e:
+            report["error"] = str(e)
+        report["seconds"] = time.perf_counter() - start_time
+        reports.append(report)
+
+    if combined:
+        write_file(combined, write_output(template_wb, template_source, combined_values, writer))
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the template from many input workbooks.")
+    parser.add_argument("inputs", nargs="+", help="Input workbooks, directories or glob patterns")
+    parser.add_argument("--template", help="Template workbook (default: template found in the current directory)")
+    parser.add_argument("--rules", help="Mapping rules JSON (default: built-in rules)")
+    parser.add_argument("--out-dir", default="processed", help="Directory for per-input outputs")
+    parser.add_argument("--combined", help="Write every input into this single workbook instead")
+    parser.add_argument("--engine", choices=["standard", "streaming"], default="standard")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes per input (0 = all CPUs)")
+    parser.add_argument("--writer", choices=["openpyxl", "fast"], default="openpyxl",
+                        help="fast patches the template's sheet XML instead of re-saving the workbook")
+    args = parser.parse_args(argv)
+
+    template_file = args.template or find_template_file()
+    if not template_file:
+        parser.error("No template file found. Pass one with --template.")
+
+    mapping_rules = load_rules(args.rules)
+
+    input_files = find_input_files(args.inputs)
+    if not input_files:
+        parser.error("No input workbooks matched.")
+
+    reports = process_batch(
+        input_files, template_file, mapping_rules,
+        output_dir=None if args.combined else args.out_dir,
+        combined=args.combined,
+        engine=args.engine,
+        workers=args.workers or None,
+        writer=args.writer,
+    )
+
+    failed = 0
+    for report in reports:
+        if report["error"]:
+            failed += 1
+            print(f"FAILED {report['input']} ({report['seconds']:.2f}s): {report['error']}")
+        else:
+            print(f"OK     {report['input']} -> {report['output']} "
+                  f"({report['sheets']} sheets, {report['seconds']:.2f}s)")
+    print(f"{len(reports) - failed}/{len(reports)} workbooks processed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""
+Benchmarks for the mapping engine on synthetic HTRI datasheet workbooks.
+
+Usage:
+    python bench.py                          # 1, 10, 100 and 1000 sheets
+    python bench.py --sheets 10 100 --engines standard streaming --writers openpyxl fast
+    python bench.py --json bench_output.json
+
+Each input sheet is laid out like DEFAULT_MAPPING_RULES expects (cells I8
+through BA57). Every case runs in its own forked process so its peak RSS is
+measured on its own. Phase times come from the job's JobStats: load_template,
+compile, read_input (loading/streaming sheets), extract, write and save.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import openpyxl
+
+from engine import (
+    DEFAULT_MAPPING_RULES,
+    JobStats,
+    df_to_rules,
+    find_template_file,
+    process_excel,
+    rules_to_df,
+    template_cache,
+)
+
+DEFAULT_SHEETS = [1, 10, 100, 1000]
+
+
+def rule_addresses(mapping_rules):
+    """List every cell address the rules read."""
+    addresses = []
+    for rules in mapping_rules.values():
+        for rule in rules:
+            if isinstance(rule, dict):
+                addresses.extend(rule.get("cells", []))
+            elif isinstance(rule, list):
+                addresses.extend(rule)
+            else:
+                addresses.append(rule)
+    return sorted(set(addresses), key=lambda a: (int("".join(c for c in a if c.isdigit())), len(a), a))
+
+
+def make_input_workbook(path, sheet_count, mapping_rules=DEFAULT_MAPPING_RULES, seed=0):
+    """Write a synthetic input workbook with sheet_count datasheet sheets."""
+    rng = random.Random(seed)
+    addresses = rule_addresses(mapping_rules)
+    wb = openpyxl.Workbook()
+    first = True
+    for n in range(sheet_count):
+        ws = wb.active if first else wb.create_sheet()
+        first = False
+        ws.title = f"E-{101 + n}"
+        for addr in addresses:
+            kind = rng.random()
+            if kind < 0.5:
+                ws[addr] = round(rng.uniform(0, 500), 2)
+            elif kind < 0.9:
+                ws[addr] = f"{addr}-{n}"
+        # Filler so the sheets are not smaller than real datasheets
+        for row in range(60, 70):
+            ws.cell(row=row, column=2).value = f"Note {row}"
+    wb.save(path)
+    return path
+
+
+def scaled_rules(factor):
+    """DEFAULT_MAPPING_RULES repeated factor times under distinct labels."""
+    rules = {}
+    for i in range(factor):
+        for label, rule_list in DEFAULT_MAPPING_RULES.items():
+            rules[f"{label} [{i}]" if i else label] = rule_list
+    return rules
+
+
+def _run_case(conn, case, input_path, template_file):
+    template_cache.clear()
+    stats = JobStats()
+    start = time.perf_counter()
+    output = process_excel(input_path, template_file, DEFAULT_MAPPING_RULES, engine=case["engine"],
+                           workers=case["workers"], writer=case["writer"], stats=stats)
+    wall = time.perf_counter() - start
+    job = stats.to_dict()
+    conn.send({
+        **case,
+        "wall": wall,
+        "phases": job["phases"],
+        "cells_read": job["cells_read"],
+        "cells_written": job["cells_written"],
+        "output_bytes": len(output.getvalue()),
+        "peak_rss_mb": job["peak_rss_mb"],
+    })
+    conn.close()
+
+
+def run_case(case, input_path, template_file):
+    """Run one benchmark case in a forked child and return its result."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_case, args=(child, case, input_path, template_file))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def bench_rules_editor(factors=(1, 10, 100)):
+    """Time the rules_to_df / df_to_rules round trip on scaled rule sets."""
+    results = []
+    for factor in factors:
+        rules = scaled_rules(factor)
+        start = time.perf_counter()
+        df = rules_to_df(rules)
+        to_df = time.perf_counter() - start
+        start = time.perf_counter()
+        df_to_rules(df)
+        to_rules = time.perf_counter() - start
+        results.append({"rules": len(df), "rules_to_df": to_df, "df_to_rules": to_rules})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_excel on synthetic workbooks.")
+    parser.add_argument("--sheets", type=int, nargs="+", default=DEFAULT_SHEETS)
+    parser.add_argument("--engines", nargs="+", default=["standard", "streaming"])
+    parser.add_argument("--writers", nargs="+", default=["openpyxl"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--template", help="Template workbook (default: template found in the current directory)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    template_file = args.template or find_template_file()
+    if not template_file:
+        parser.error("No template file found. Pass one with --template.")
+
+    results = {"cases": [], "rules_editor": bench_rules_editor()}
+    with tempfile.TemporaryDirectory() as tmp:
+        for sheet_count in args.sheets:
+            input_path = make_input_workbook(os.path.join(tmp, f"input_{sheet_count}.xlsx"), sheet_count)
+            for engine in args.engines:
+                for workers in args.workers:
+                    for writer in args.writers:
+                        case = {"sheets": sheet_count, "engine": engine, "workers": workers, "writer": writer}
+                        result = run_case(case, input_path, template_file)
+                        result["input_bytes"] = os.path.getsize(input_path)
+                        results["cases"].append(result)
+                        phases = " ".join(f"{k}={v:.3f}s" for k, v in result["phases"].items())
+                        print(f"{sheet_count:>5} sheets  {engine:<9} workers={workers:<2} {writer:<8} "
+                              f"wall={result['wall']:.3f}s  peak={result['peak_rss_mb']:.0f}MB  {phases}")
+
+    for row in results["rules_editor"]:
+        print(f"rules editor: {row['rules']:>5} rules  rules_to_df={row['rules_to_df']:.4f}s  "
+              f"df_to_rules={row['df_to_rules']:.4f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    main()
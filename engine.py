@@ -0,0 +1,2573 @@
+"""
+The mapping engine behind the Streamlit app, importable without Streamlit.
+
+Usage:
+    python -m engine INPUT [-o processed_output.xlsx] [--template template.xlsx] [--rules rules.json]
+    python -m engine INPUT --table csv -o extracted_data.csv
+    python -m engine INPUT --rule-set NAME[@VERSION]
+    python -m engine REV_A REV_B [REV_C ...] --diff -o revision_diff.csv
+
+pandas is only imported by the functions that build or read DataFrames
+(rules_to_df, df_to_rules, extract_table), so scripts that just fill
+templates do not pay for it.
+"""
+import openpyxl
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter, range_boundaries
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils.exceptions import CellCoordinatesException, IllegalCharacterError
+from io import BytesIO
+import io
+import argparse
+import os
+import sys
+import mmap
+import shutil
+import tempfile
+import json
+import functools
+import time
+from contextlib import contextmanager, nullcontext
+import re
+import zipfile
+from xml.sax.saxutils import escape
+import hashlib
+import pickle
+import threading
+import uuid
+import sqlite3
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# --- Default Configuration ---
+DEFAULT_MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Item No.": ["AV8"],
+    "Size": [ ["E9", "M9", "N9"] ], 
+    "Type": ["Y9", "V49"], 
+    "Surf/Unit (Gross/Eff)": [ ["K10", "O10", "P10"] ],
+    "Fluid Name": ["T13", "AR13"], 
+    "Fluid Quantity, Total": ["T14", "AR14"],
+    "Temperature (In/Out)": [ 
+        {"action": "vertical", "cells": ["T20", "AF20"]}, 
+        {"action": "vertical", "cells": ["AR20", "BD20"]} 
+    ],
+    "Inlet Pressure": ["AB28", "AZ28"],
+    "Velocity": ["AB29", "AZ29"],
+    "Pressure Drop, Allow/Calc": [ 
+        {"action": "vertical", "cells": ["T30", "AF30"]}, 
+        {"action": "vertical", "cells": ["AR30", "BD30"]} 
+    ],
+    "Heat Exchanged": ["M32"],
+    "MTD (Corrected)": ["BB32"],
+    "Transfer Rate, Service": ["M33"],
+    "Clean": ["AH33"],
+    "Actual": ["BB33"],
+    "Design/Test Pressure": ["T36"],
+    "Design Temperature": ["T37"],
+    "No Passes per Shell": ["T38"],
+    "Tube No.": ["F43"],
+    "OD": ["N43", "AC45"], 
+    "Thk(Avg)": ["AC43"],
+    "Length": ["AR43"],
+    "Pitch": ["BG43"],
+    "Tube Type": ["F44"],
+    "Material": ["AH44"],
+    "Tube pattern": ["BM44"],
+    "Shell": ["E45"],
+    "ID": ["U45"],
+    "Shell Cover": ["AU45"],
+    "Channel or Bonnet": ["K46"],
+    "Channel Cover": ["AU46"],
+    "Tubesheet-Stationary": ["K47"],
+    "Tubesheet-Floating": ["AW47"],
+    "Floating Head Cover": ["K48"],
+    "Impingement Plate": ["AW48"],
+    "Baffles-Cross": ["H49"],
+    "%Cut (Diam)": ["AM49"],
+    "Spacing(c/c)": ["AX49"],
+    "Inlet": ["BG49"],
+    "TEMA Class": ["BA57"]
+}
+
+# --- Helper Functions ---
+
+RULE_TYPES = ("Single", "Merge", "Vertical")
+RULES_FRAME_CACHE_SIZE = 8
+
+def _rule_type(rule):
+    if isinstance(rule, list):
+        return "Merge"
+    if isinstance(rule, dict) and rule.get("action") == "vertical":
+        return "Vertical"
+    return "Single"
+
+def _rule_text(rule):
+    if isinstance(rule, list):
+        return ", ".join(rule)
+    if isinstance(rule, dict) and rule.get("action") == "vertical":
+        return ", ".join(rule["cells"])
+    return str(rule)
+
+@functools.lru_cache(maxsize=RULES_FRAME_CACHE_SIZE)
+def _rules_frame(key):
+    import pandas as pd
+
+    rules_dict = json.loads(key)
+    rules = pd.Series(list(rules_dict.values()), index=list(rules_dict), dtype=object)
+    rules = rules[rules.map(len) > 0].explode()
+    labels = pd.Series(rules.index.tolist())
+    return pd.DataFrame({
+        "Label": labels,
+        "Order": labels.groupby(labels, sort=False).cumcount() + 1,
+        "Type": rules.map(_rule_type).to_numpy(),
+        "Cells": rules.map(_rule_text).to_numpy(),
+    }, columns=["Label", "Order", "Type", "Cells"])
+
+def rules_to_df(rules_dict):
+    """
+    Convert mapping rules dict to a flat DataFrame for editing.
+
+    Frames are memoized on the rules' content, so a Streamlit rerun with
+    unchanged rules only pays for a copy.
+    """
+    return _rules_frame(json.dumps(rules_dict, ensure_ascii=False)).copy()
+
+_frame_rules_cache = OrderedDict()
+_frame_rules_lock = threading.Lock()
+
+def _frame_key(df):
+    import pandas as pd
+
+    frame = df.reindex(columns=["Label", "Order", "Type", "Cells"])
+    digest = hashlib.sha256(pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _frame_rules(df):
+    df = df.reset_index(drop=True)
+    labels = df["Label"]
+    missing_label = labels.isna() | (labels.astype(str).str.strip() == "")
+    types = df["Type"]
+    cells = df["Cells"].fillna("").astype(str).str.split(",").explode().str.strip()
+    cells = cells[cells != ""]
+    counts = cells.index.value_counts().reindex(df.index, fill_value=0)
+
+    # Each distinct address is parsed once, however many rows use it
+    bad_addresses = {}
+    for addr in cells.unique():
+        try:
+            parse_address(addr)
+        except ValueError as e:
+            bad_addresses[addr] = str(e)
+    address_errors = cells.map(bad_addresses).dropna()
+
+    problems = {}
+    def report(rows, message):
+        for row in rows:
+            problems.setdefault(row, []).append(message)
+    report(df.index[missing_label & (counts > 0)], "missing label")
+    report(df.index[~types.isin(RULE_TYPES) & (counts > 0)], "type must be Single, Merge or Vertical")
+    report(df.index[(types == "Vertical") & (counts > 2)], "a Vertical rule needs one or two cells (In, Out)")
+    for row, message in address_errors.items():
+        report([row], message)
+    if problems:
+        lines = []
+        for row in sorted(problems):
+            label = "" if missing_label[row] else f" ({labels[row]})"
+            lines.extend(f"- Row {row + 1}{label}: {message}" for message in problems[row])
+        raise ValueError("Invalid mapping rules:\n" + "\n".join(lines))
+
+    # Rows without cells are dropped; the rest are ordered by Label, then Order
+    row_cells = {}
+    for row, addr in zip(cells.index, cells.to_numpy()):
+        row_cells.setdefault(row, []).append(addr)
+    rows = df[counts > 0].sort_values(by=["Label", "Order"], kind="stable")
+    rules_dict = {}
+    for row, label, rtype in zip(rows.index, rows["Label"], rows["Type"]):
+        cells_of_row = row_cells[row]
+        if rtype == "Merge":
+            rule = cells_of_row
+        elif rtype == "Vertical":
+            rule = {"action": "vertical", "cells": cells_of_row}
+        else:  # Single
+            rule = cells_of_row[0]
+        rules_dict.setdefault(label, []).append(rule)
+    return rules_dict
+
+def df_to_rules(df):
+    """
+    Convert edited DataFrame back to mapping rules dict.
+
+    Every row is checked in one pass and all problems are raised together
+    as a ValueError, one line per editor row ("Row 3 (Size): ..."). Results
+    are memoized on the frame's content hash, so saving an unchanged editor
+    does not re-parse it.
+    """
+    key = _frame_key(df)
+    with _frame_rules_lock:
+        cached = _frame_rules_cache.get(key)
+        if cached is not None:
+            _frame_rules_cache.move_to_end(key)
+    if cached is None:
+        try:
+            cached = ("ok", json.dumps(_frame_rules(df), ensure_ascii=False))
+        except ValueError as e:
+            cached = ("error", str(e))
+        with _frame_rules_lock:
+            _frame_rules_cache[key] = cached
+            while len(_frame_rules_cache) > RULES_FRAME_CACHE_SIZE:
+                _frame_rules_cache.popitem(last=False)
+    status, value = cached
+    if status == "error":
+        raise ValueError(value)
+    return json.loads(value)
+
+def find_template_file():
+    if os.path.exists("template.xlsx"): return "template.xlsx"
+    files = os.listdir()
+    for file in files:
+        if file.lower() == "template.xlsx": return file
+    xlsx_files = [f for f in files if f.endswith(".xlsx")]
+    ignore_list = ["processed_output.xlsx", "dummy_input.xlsx", "dummy_template.xlsx"]
+    candidates = [f for f in xlsx_files if f not in ignore_list and not f.startswith("dummy_") and not f.startswith("~$")]
+    return candidates[0] if candidates else None
+
+def get_cell_value(sheet, addr):
+    row, col = parse_address(addr)
+    val = sheet.cell(row=row, column=col).value
+    return str(val) if val is not None else ""
+
+# --- Instrumentation ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process since it started in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+def input_size(input_file):
+    """Size in bytes of an input path or in-memory file, or None."""
+    if isinstance(input_file, (str, os.PathLike)):
+        return os.path.getsize(input_file)
+    if hasattr(input_file, "getbuffer"):
+        return input_file.getbuffer().nbytes
+    return getattr(input_file, "size", None)
+
+class JobStats:
+    """
+    Instrumentation for one processing job.
+
+    Collects phase timings, per-sheet read/extract timings, cells read and
+    written, the input size, extraction errors, template/rule warnings and
+    the process's peak memory. The peak is the highest RSS since the process
+    started (ru_maxrss), so it covers this job only when the job ran in a
+    fresh process, as in bench.py and loadtest.py. If on_event is given it
+    is called as on_event(event, payload) for "phase", "sheet", "error",
+    "chunk", "resume" and "done" events while the job runs.
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.phases = {}
+        self.sheets = []
+        self.errors = []
+        self.warnings = []
+        self.cells_read = 0
+        self.cells_written = 0
+        self.input_bytes = None
+        self.cache = None
+        self.peak_rss_mb = None
+        self.resumed_sheets = 0
+        self.checkpointed_sheets = 0
+
+    def _emit(self, event, payload):
+        if self.on_event is not None:
+            self.on_event(event, payload)
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add_phase(name, seconds)
+            self._emit("phase", {"phase": name, "seconds": seconds})
+
+    def record_sheet(self, index, read_seconds, extract_seconds, cells, errors):
+        cells_read = sum(len(addrs) for addrs in cells)
+        self.cells_read += cells_read
+        self.add_phase("read_input", read_seconds)
+        self.add_phase("extract", extract_seconds)
+        entry = {
+            "sheet": index,
+            "read_seconds": read_seconds,
+            "extract_seconds": extract_seconds,
+            "cells_read": cells_read,
+            "errors": len(errors),
+        }
+        self.sheets.append(entry)
+        self._emit("sheet", entry)
+        for label, message in errors:
+            error = {"sheet": index, "label": label, "error": message}
+            self.errors.append(error)
+            self._emit("error", error)
+
+    def record_resume(self, sheets):
+        """Note that the first `sheets` sheets were taken from a checkpoint instead of read."""
+        self.resumed_sheets = sheets
+        self._emit("resume", {"sheets": sheets})
+
+    def record_chunk(self, sheets_done, total_sheets):
+        self.checkpointed_sheets = sheets_done
+        self._emit("chunk", {"sheets_done": sheets_done, "total_sheets": total_sheets})
+
+    def record_write(self, seconds, cells_written):
+        self.add_phase("write", seconds)
+        self.cells_written += cells_written
+
+    def finish(self):
+        self.peak_rss_mb = peak_rss_mb()
+        self._emit("done", self.to_dict())
+
+    def to_dict(self):
+        return {
+            "phases": dict(self.phases),
+            "total_seconds": sum(self.phases.values()),
+            "sheets": list(self.sheets),
+            "errors": list(self.errors),
+            "warnings": list(self.warnings),
+            "cells_read": self.cells_read,
+            "cells_written": self.cells_written,
+            "input_bytes": self.input_bytes,
+            "cache": self.cache,
+            "peak_rss_mb": self.peak_rss_mb,
+            "resumed_sheets": self.resumed_sheets,
+            "checkpointed_sheets": self.checkpointed_sheets,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4, ensure_ascii=False)
+
+def _phase(stats, name):
+    return stats.phase(name) if stats is not None else nullcontext()
+
+def _warnings(stats):
+    return stats.warnings if stats is not None else None
+
+# --- Template Cache ---
+
+TEMPLATE_CACHE_SIZE = 8
+
+class TemplateCache:
+    """
+    LRU cache of parsed template workbooks.
+
+    Files on disk are keyed by path, mtime and size; uploaded templates by
+    the SHA-256 of their content. Each entry is a pickled snapshot of the
+    parsed workbook, so every job gets its own copy without re-parsing the
+    xlsx.
+    """
+
+    def __init__(self, maxsize=TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key_for(self, template_file):
+        source = read_input_source(template_file)
+        if isinstance(source, bytes):
+            return ("sha256", hashlib.sha256(source).hexdigest()), source
+        stat = os.stat(source)
+        return ("path", os.path.abspath(source), stat.st_mtime_ns, stat.st_size), source
+
+    def load(self, template_file):
+        """Return a fresh, independent copy of the parsed template workbook."""
+        key, source = self.key_for(template_file)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+        if snapshot is None:
+            template_wb = openpyxl.load_workbook(open_input_source(source))
+            snapshot = pickle.dumps(template_wb, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                self._snapshots[key] = snapshot
+                self._snapshots.move_to_end(key)
+                while len(self._snapshots) > self.maxsize:
+                    self._snapshots.popitem(last=False)
+            return template_wb
+        return pickle.loads(snapshot)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def __len__(self):
+        return len(self._snapshots)
+
+template_cache = TemplateCache()
+
+def load_template(template_file):
+    """Load a template workbook through the shared template cache."""
+    return template_cache.load(template_file)
+
+# --- Rule Validation ---
+
+MAX_ROW = 1048576
+MAX_COLUMN = 16384  # XFD
+
+@functools.lru_cache(maxsize=None)
+def _parse_address(addr):
+    try:
+        col_letter, row = coordinate_from_string(addr.strip())
+        col = column_index_from_string(col_letter)
+    except (CellCoordinatesException, ValueError):
+        raise ValueError(f"{addr!r} is not a valid cell address") from None
+    if not 1 <= row <= MAX_ROW or col > MAX_COLUMN:
+        raise ValueError(f"{addr!r} is outside the worksheet")
+    return row, col
+
+def parse_address(addr):
+    """Parse an A1 cell address ("AV8", "$B$3", "i8") into (row, column), cached per address."""
+    if not isinstance(addr, str):
+        raise ValueError(f"{addr!r} is not a valid cell address")
+    return _parse_address(addr)
+
+def rule_cells(rule):
+    """Return the cell addresses of one rule, or raise ValueError if the rule is malformed."""
+    if isinstance(rule, dict):
+        if rule.get("action") != "vertical":
+            raise ValueError(f"unknown action {rule.get('action')!r}")
+        cells = rule.get("cells")
+        if not isinstance(cells, list) or not 1 <= len(cells) <= 2:
+            raise ValueError("a Vertical rule needs one or two cells (In, Out)")
+        return cells
+    if isinstance(rule, list):
+        if not rule:
+            raise ValueError("a Merge rule needs at least one cell")
+        return rule
+    return [rule]
+
+def rule_errors(mapping_rules):
+    """List every problem in a mapping rules dict as a message; empty if the rules are valid."""
+    if not isinstance(mapping_rules, dict):
+        return ["mapping rules must map each label to a list of rules"]
+    problems = []
+    for label, rules in mapping_rules.items():
+        if not isinstance(rules, list):
+            problems.append(f"{label}: rules must be a list")
+            continue
+        for n, rule in enumerate(rules, start=1):
+            try:
+                for addr in rule_cells(rule):
+                    parse_address(addr)
+            except ValueError as e:
+                problems.append(f"{label} (rule {n}): {e}")
+    return problems
+
+def validate_rules(mapping_rules):
+    """
+    Check every rule and cell address up front.
+
+    Returns the rules unchanged if they are valid and raises ValueError
+    listing all problems otherwise. Parsed addresses are cached, so reading
+    them during extraction costs a dict lookup.
+    """
+    problems = rule_errors(mapping_rules)
+    if problems:
+        raise ValueError("Invalid mapping rules:\n" + "\n".join(f"- {p}" for p in problems))
+    return mapping_rules
+
+# --- Mapping Plan ---
+
+PLAN_CACHE_SIZE = 32
+
+def rules_key(mapping_rules):
+    """Canonical, hashable key for a mapping rules dict."""
+    if isinstance(mapping_rules, RuleSet):
+        return mapping_rules.key
+    return json.dumps(mapping_rules, sort_keys=True, ensure_ascii=False)
+
+def read_template_labels(template_sheet):
+    """Read the stripped Column A labels from row 2 to the sheet's last used row, in one pass."""
+    labels = []
+    for (label,) in template_sheet.iter_rows(min_row=2, max_row=template_sheet.max_row, max_col=1, values_only=True):
+        labels.append(str(label).strip() if label else None)
+    while labels and labels[-1] is None:
+        labels.pop()
+    return tuple(labels)
+
+def index_template_labels(labels):
+    """Map each template label to the rows it appears on, in order (labels start at row 2)."""
+    index = {}
+    for row_idx, label in enumerate(labels, start=2):
+        if label is not None:
+            index.setdefault(label, []).append(row_idx)
+    return index
+
+def rule_writes(rule, row_idx):
+    """Resolve one rule to its (row, cell addresses) writes, starting at row_idx."""
+    if isinstance(rule, dict) and rule.get("action") == "vertical":
+        cells = rule.get("cells") or []
+        return tuple((row_idx + offset, (addr,)) for offset, addr in enumerate(cells[:2]))
+    if isinstance(rule, list):
+        return ((row_idx, tuple(rule)),)
+    return ((row_idx, (rule,)),)
+
+def plan_warnings(index, mapping_rules):
+    """List template labels without rules and rules without template rows."""
+    warnings = []
+    for label, rows in index.items():
+        rules = mapping_rules.get(label)
+        if rules is None:
+            warnings.append(f"Template label '{label}' (row {rows[0]}) has no mapping rule")
+        elif len(rows) > len(rules):
+            unmapped = ", ".join(str(row_idx) for row_idx in rows[len(rules):])
+            warnings.append(f"Template label '{label}' has more rows than rules; row(s) {unmapped} stay empty")
+    for label, rules in mapping_rules.items():
+        rows = index.get(label, ())
+        if not rows:
+            warnings.append(f"Rule '{label}' matches no template label")
+        elif len(rules) > len(rows):
+            warnings.append(f"Rule '{label}' has {len(rules)} rules but the template has {len(rows)} row(s) for it")
+    return warnings
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_plan(labels, key):
+    mapping_rules = validate_rules(json.loads(key))
+    index = index_template_labels(labels)
+    plan = []
+    for label, rules in mapping_rules.items():
+        # The n-th occurrence of a label takes its n-th rule
+        for row_idx, rule in zip(index.get(label, ()), rules):
+            plan.append((label, rule_writes(rule, row_idx)))
+    plan.sort(key=lambda entry: entry[1][0][0])
+    return tuple(plan), tuple(plan_warnings(index, mapping_rules))
+
+def compile_mapping_plan(template_sheet, mapping_rules, warnings=None):
+    """
+    Resolve which rule applies to which template row.
+
+    Returns a tuple of (label, writes) entries in template row order, where
+    writes is a tuple of (row, cell addresses) pairs. A Vertical rule spills
+    into row + 1. Every Column A label down to the sheet's last used row is
+    considered. Plans are cached on the template labels and the rules, so
+    repeated calls with the same template and rules do not recompile; for a
+    stored RuleSet they are also persisted next to its version.
+    Invalid rules raise ValueError before any input is read. If warnings is
+    a list, messages about unmapped labels and unused rules are appended.
+    """
+    labels = read_template_labels(template_sheet)
+    if isinstance(mapping_rules, RuleSet):
+        plan, messages = mapping_rules.compiled_plan(labels)
+    else:
+        plan, messages = _compile_plan(labels, rules_key(mapping_rules))
+    if warnings is not None:
+        warnings.extend(messages)
+    return plan
+
+def extract_cells(plan, read_cell, errors=None):
+    """
+    Read the mapped values of one input sheet as a {cell addresses: value} dict.
+
+    Values are keyed by the addresses they were read from, not by template
+    row, so they stay valid when the template or the rules change. Failed
+    rules are skipped and, if errors is a list, appended to it as
+    (label, message).
+    """
+    cells = {}
+    for label, writes in plan:
+        try:
+            for _, addrs in writes:
+                if addrs not in cells:
+                    parts = [read_cell(addr) for addr in addrs]
+                    cells[addrs] = " ".join([v for v in parts if v])
+        except Exception as e:
+            if errors is not None:
+                errors.append((label, str(e)))
+    return cells
+
+def rows_from_cells(plan, cells):
+    """Lay out extracted cell values as a {row: value} dict following the plan."""
+    values = {}
+    for _, writes in plan:
+        for row_idx, addrs in writes:
+            if addrs not in cells:
+                break
+            values[row_idx] = cells[addrs]
+    return values
+
+def extract_values(plan, read_cell):
+    """Read the mapped values of one input sheet as a {row: value} dict."""
+    return rows_from_cells(plan, extract_cells(plan, read_cell))
+
+# --- Streaming Input Engine ---
+
+def collect_addresses(plan):
+    """List the distinct input cell addresses a mapping plan reads."""
+    addresses = []
+    seen = set()
+    for _, writes in plan:
+        for _, addrs in writes:
+            for addr in addrs:
+                if isinstance(addr, str) and addr not in seen:
+                    seen.add(addr)
+                    addresses.append(addr)
+    return tuple(addresses)
+
+def build_address_slots(addresses):
+    """
+    Map each valid address to its (slot, row, column).
+
+    The slot is the address's position in the per-sheet value vector.
+    """
+    slots = {}
+    for addr in addresses:
+        slots[addr] = (len(slots),) + parse_address(addr)
+    return slots
+
+def read_sheet_vector(input_sheet, slots):
+    """Read only the slotted cells of a read-only sheet in a single forward pass."""
+    vector = [None] * len(slots)
+    if not slots:
+        return vector
+
+    wanted = {}
+    for slot, row, col in slots.values():
+        wanted.setdefault(row, []).append((slot, col))
+    min_row, max_row = min(wanted), max(wanted)
+    min_col = min(col for _, _, col in slots.values())
+    max_col = max(col for _, _, col in slots.values())
+
+    rows = input_sheet.iter_rows(
+        min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True
+    )
+    for row_idx, row in enumerate(rows, start=min_row):
+        for slot, col in wanted.get(row_idx, ()):
+            offset = col - min_col
+            if offset < len(row):
+                vector[slot] = row[offset]
+    return vector
+
+def has_cells(sheet):
+    """Whether a sheet holds cells; chartsheets do not and read as blank in every engine."""
+    return hasattr(sheet, "iter_rows")
+
+def blank_cell(addr):
+    return ""
+
+def iter_streaming_sheets(input_file, plan, start=0, stop=None):
+    """Yield a cell reader per input sheet without materializing the workbook."""
+    slots = build_address_slots(collect_addresses(plan))
+    input_wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        for sheet_name in input_wb.sheetnames[start:stop]:
+            input_sheet = input_wb[sheet_name]
+            if not has_cells(input_sheet):
+                yield blank_cell
+                continue
+            vector = read_sheet_vector(input_sheet, slots)
+
+            def read_cell(addr, vector=vector):
+                val = vector[slots[addr][0]]
+                return str(val) if val is not None else ""
+
+            yield read_cell
+    finally:
+        input_wb.close()
+
+def iter_standard_sheets(input_file):
+    """Yield a cell reader per input sheet of a fully loaded workbook."""
+    input_wb = openpyxl.load_workbook(input_file, data_only=True)
+    for sheet_name in input_wb.sheetnames:
+        input_sheet = input_wb[sheet_name]
+        yield functools.partial(get_cell_value, input_sheet) if has_cells(input_sheet) else blank_cell
+
+# --- Spooled I/O ---
+
+SPOOL_INPUT_BYTES = 8 * 1024 * 1024
+SPOOL_OUTPUT_BYTES = 8 * 1024 * 1024
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+class MappedFile(io.RawIOBase):
+    """Read-only file object over a memory-mapped file, so zip members are read straight from the page cache."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.name = os.fspath(path)
+        with open(self.name, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def size(self):
+        return len(self._map)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def tell(self):
+        return self._map.tell()
+
+    def read(self, size=-1):
+        return self._map.read(size if size is not None and size >= 0 else None)
+
+    def readinto(self, buffer):
+        data = self._map.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._map.close()
+        super().close()
+
+class SpooledOutput(tempfile.SpooledTemporaryFile):
+    """An output file kept in memory up to max_size bytes and in a temporary file beyond it."""
+
+    def getvalue(self):
+        position = self.tell()
+        self.seek(0)
+        data = self.read()
+        self.seek(position)
+        return data
+
+def new_output(max_size=None):
+    """Return an empty output file that spools to disk past SPOOL_OUTPUT_BYTES (or max_size)."""
+    return SpooledOutput(max_size=SPOOL_OUTPUT_BYTES if max_size is None else max_size)
+
+class SpooledUpload:
+    """
+    An uploaded file, copied once into a form the engine can read cheaply.
+
+    Uploads up to max_size bytes (SPOOL_INPUT_BYTES by default) are kept in
+    memory; larger ones are copied in chunks to a temporary file, which the
+    engine then reads memory-mapped. file is a BytesIO or a path to pass to
+    process_excel; close() removes the temporary file.
+    """
+
+    def __init__(self, upload, max_size=None, dir=None):
+        max_size = SPOOL_INPUT_BYTES if max_size is None else max_size
+        self.name = getattr(upload, "name", None)
+        self.path = None
+        size = input_size(upload)
+        if size is not None and size <= max_size:
+            self.file = BytesIO(read_input_source(upload))
+            return
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", dir=dir, delete=False) as f:
+            upload.seek(0)
+            shutil.copyfileobj(upload, f, SPOOL_CHUNK_BYTES)
+        self.path = self.file = f.name
+
+    def close(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --- Parallel Extraction ---
+
+def read_input_source(input_file):
+    """Return a path or the raw bytes of an input, so it can be sent to worker processes."""
+    if isinstance(input_file, (str, os.PathLike)):
+        return input_file
+    if isinstance(input_file, MappedFile):
+        return input_file.name
+    if hasattr(input_file, "getvalue"):
+        return input_file.getvalue()
+    input_file.seek(0)
+    return input_file.read()
+
+def open_input_source(source):
+    return BytesIO(source) if isinstance(source, bytes) else MappedFile(source)
+
+def read_sheet_names(source):
+    """List the sheet names of an input without loading its sheets."""
+    input_wb = openpyxl.load_workbook(open_input_source(source), read_only=True)
+    sheet_names = input_wb.sheetnames
+    input_wb.close()
+    return sheet_names
+
+def iter_timed_cells(sheet_readers, plan):
+    """
+    Yield (cells, errors, read seconds, extract seconds) per sheet reader.
+
+    Read time is the time taken to produce the reader, i.e. loading or
+    streaming the sheet.
+    """
+    start = time.perf_counter()
+    for read_cell in sheet_readers:
+        read_seconds = time.perf_counter() - start
+        errors = []
+        extract_start = time.perf_counter()
+        cells = extract_cells(plan, read_cell, errors)
+        yield cells, errors, read_seconds, time.perf_counter() - extract_start
+        start = time.perf_counter()
+
+def _extract_sheet_range(source, plan, start, stop):
+    """Worker: extract the values of input sheets [start, stop)."""
+    readers = iter_streaming_sheets(open_input_source(source), plan, start, stop)
+    return list(iter_timed_cells(readers, plan))
+
+def iter_parallel_cells(input_file, plan, workers, stats=None):
+    """
+    Extract per-sheet cell values across a process pool, yielding them in sheet order.
+
+    The input sheets are split into one contiguous range per worker. Workers
+    always read with the streaming engine.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    source = read_input_source(input_file)
+    sheet_count = len(read_sheet_names(source))
+
+    size = max(1, -(-sheet_count // workers))
+    ranges = [(start, min(start + size, sheet_count)) for start in range(0, sheet_count, size)]
+    with ProcessPoolExecutor(max_workers=max(1, len(ranges))) as pool:
+        futures = [pool.submit(_extract_sheet_range, source, plan, start, stop) for start, stop in ranges]
+        for (start, _), future in zip(ranges, futures):
+            for index, (cells, errors, read_seconds, extract_seconds) in enumerate(future.result(), start=start):
+                if stats is not None:
+                    stats.record_sheet(index, read_seconds, extract_seconds, cells, errors)
+                yield cells
+
+def iter_sheet_cells(input_file, plan, engine="standard", workers=1, stats=None):
+    """Yield the {cell addresses: value} dict of each input sheet, in sheet order."""
+    if engine not in ("standard", "streaming"):
+        raise ValueError(f"Unknown input engine: {engine}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers > 1:
+        yield from iter_parallel_cells(input_file, plan, workers, stats)
+        return
+
+    if isinstance(input_file, (str, os.PathLike)):
+        input_file = open_input_source(input_file)
+    if engine == "streaming":
+        sheet_readers = iter_streaming_sheets(input_file, plan)
+    else:
+        sheet_readers = iter_standard_sheets(input_file)
+    timed = iter_timed_cells(sheet_readers, plan)
+    for index, (cells, errors, read_seconds, extract_seconds) in enumerate(timed):
+        if stats is not None:
+            stats.record_sheet(index, read_seconds, extract_seconds, cells, errors)
+        yield cells
+
+def iter_sheet_values(input_file, plan, engine="standard", workers=1, stats=None):
+    """Yield the {row: value} dict of each input sheet, in sheet order."""
+    for cells in iter_sheet_cells(input_file, plan, engine, workers, stats):
+        yield rows_from_cells(plan, cells)
+
+# --- Result Cache ---
+
+RESULT_CACHE_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_INPUTS = 16
+RESULT_CACHE_FILLED_BYTES = 32 * 1024 * 1024  # Saved size; a live workbook takes several times this
+
+def content_hash(source):
+    """SHA-256 of raw bytes or of a file's content."""
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def job_key(input_source, template_file, mapping_rules, layout="columns"):
+    """(input hash, template hash, rules hash) identifying the output of one job."""
+    template_source = read_input_source(template_file)
+    if isinstance(mapping_rules, RuleSet):
+        # Stored versions are immutable and carry their hash
+        rules_hash = mapping_rules.digest if layout == "columns" else f"{layout}:{mapping_rules.digest}"
+    else:
+        rules = rules_key(mapping_rules) if layout == "columns" else f"{layout}:{rules_key(mapping_rules)}"
+        rules_hash = hashlib.sha256(rules.encode("utf-8")).hexdigest()
+    return (content_hash(input_source), content_hash(template_source), rules_hash)
+
+class ResultCache:
+    """
+    Bounded cache of processed outputs and per-sheet extracted cell values.
+
+    Outputs are keyed by (input hash, template hash, rules hash) and kept in
+    memory up to max_bytes, least recently used first out. Extracted cell
+    values are keyed by the input hash alone, so after a rules change only
+    the rules reading new cells go back to the input workbook. With
+    spill_dir set, evicted entries are written there and read back on a
+    later miss. The last filled workbook per input and template is also kept,
+    so a rules change only rewrites the rows it affects. Those live
+    workbooks have their own budget, max_filled_bytes, counted by their
+    saved size; they are dropped rather than spilled when it runs out, and
+    the next rules change then fills from scratch.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES, max_inputs=RESULT_CACHE_INPUTS, spill_dir=None,
+                 max_filled_bytes=RESULT_CACHE_FILLED_BYTES):
+        self.max_bytes = max_bytes
+        self.max_inputs = max_inputs
+        self.max_filled_bytes = max_filled_bytes
+        self.spill_dir = spill_dir
+        self._outputs = OrderedDict()
+        self._output_bytes = 0
+        self._cells = OrderedDict()
+        self._filled = OrderedDict()
+        self._filled_bytes = 0
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def make_key(self, input_source, template_file, mapping_rules, layout="columns"):
+        return job_key(input_source, template_file, mapping_rules, layout)
+
+    def _spill_path(self, name):
+        return os.path.join(self.spill_dir, name)
+
+    def get_output(self, key):
+        """Return the cached output bytes for key, or None."""
+        with self._lock:
+            if key in self._outputs:
+                self._outputs.move_to_end(key)
+                return self._outputs[key]
+        if self.spill_dir:
+            path = self._spill_path("-".join(key) + ".xlsx")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                self.put_output(key, data)
+                return data
+        return None
+
+    def put_output(self, key, data):
+        evicted = []
+        with self._lock:
+            if key in self._outputs:
+                self._output_bytes -= len(self._outputs.pop(key))
+            self._outputs[key] = data
+            self._output_bytes += len(data)
+            while self._output_bytes > self.max_bytes and len(self._outputs) > 1:
+                old_key, old_data = self._outputs.popitem(last=False)
+                self._output_bytes -= len(old_data)
+                evicted.append((old_key, old_data))
+        if self.spill_dir:
+            for old_key, old_data in evicted:
+                with open(self._spill_path("-".join(old_key) + ".xlsx"), "wb") as f:
+                    f.write(old_data)
+
+    def get_cells(self, input_hash):
+        """Return a copy of the cached per-sheet cell values for an input, or None."""
+        with self._lock:
+            sheets = self._cells.get(input_hash)
+            if sheets is not None:
+                self._cells.move_to_end(input_hash)
+        if sheets is None and self.spill_dir:
+            path = self._spill_path(input_hash + ".cells.pkl")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    sheets = pickle.load(f)
+                self.put_cells(input_hash, sheets)
+        return [dict(cells) for cells in sheets] if sheets is not None else None
+
+    def put_cells(self, input_hash, sheets):
+        evicted = []
+        with self._lock:
+            self._cells[input_hash] = sheets
+            self._cells.move_to_end(input_hash)
+            while len(self._cells) > self.max_inputs:
+                evicted.append(self._cells.popitem(last=False))
+        if self.spill_dir:
+            for old_hash, old_sheets in evicted:
+                with open(self._spill_path(old_hash + ".cells.pkl"), "wb") as f:
+                    pickle.dump(old_sheets, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def extract(self, input_hash, input_file, plan, engine="standard", workers=1, stats=None):
+        """
+        Return the per-sheet cell values the plan needs, reading the input only
+        for the rules whose cells are not cached yet.
+        """
+        sheets = self.get_cells(input_hash)
+        if sheets is None:
+            missing_plan = plan
+        else:
+            missing_plan = tuple(
+                (label, writes) for label, writes in plan
+                if any(addrs not in cells for cells in sheets for _, addrs in writes)
+            )
+
+        if sheets is None or missing_plan:
+            extracted = list(iter_sheet_cells(input_file, missing_plan, engine, workers, stats))
+            if sheets is None:
+                sheets = extracted
+            else:
+                for cells, new_cells in zip(sheets, extracted):
+                    cells.update(new_cells)
+            self.put_cells(input_hash, [dict(cells) for cells in sheets])
+        return sheets
+
+    def take_filled(self, key):
+        """
+        Remove and return (rules, workbook) of the last output filled from the
+        same input and template, or None. The caller owns the workbook and
+        hands it back with put_filled.
+        """
+        with self._lock:
+            entry = self._filled.pop(key[:2], None)
+            if entry is not None:
+                self._filled_bytes -= entry[2]
+        if entry is None:
+            return None
+        rules_json, template_wb, _ = entry
+        return json.loads(rules_json), template_wb
+
+    def put_filled(self, key, mapping_rules, template_wb, size):
+        """Keep a filled workbook whose saved output is size bytes, if it fits in max_filled_bytes."""
+        with self._lock:
+            old = self._filled.pop(key[:2], None)
+            if old is not None:
+                self._filled_bytes -= old[2]
+            if size > self.max_filled_bytes:
+                return
+            self._filled[key[:2]] = (rules_key(mapping_rules), template_wb, size)
+            self._filled_bytes += size
+            while len(self._filled) > self.max_inputs or self._filled_bytes > self.max_filled_bytes:
+                _, _, old_size = self._filled.popitem(last=False)[1]
+                self._filled_bytes -= old_size
+
+    def clear(self):
+        with self._lock:
+            self._outputs.clear()
+            self._output_bytes = 0
+            self._cells.clear()
+            self._filled.clear()
+            self._filled_bytes = 0
+
+result_cache = ResultCache()
+
+def fill_template(template_sheet, sheet_values, start=0, stats=None):
+    """
+    Write each sheet's {row: value} dict into its own template column.
+
+    Sheet i goes to column 3 + start + i, with start + i + 1 in row 1.
+    Returns the number of sheets written.
+    """
+    count = 0
+    for i, values in enumerate(sheet_values, start=start):
+        write_start = time.perf_counter()
+        target_col_idx = 3 + i
+        template_sheet.cell(row=1, column=target_col_idx).value = i + 1
+        
+        for row_idx, value in values.items():
+            template_sheet.cell(row=row_idx, column=target_col_idx).value = value
+        count += 1
+        if stats is not None:
+            stats.record_write(time.perf_counter() - write_start, len(values) + 1)
+    return count
+
+# --- Fast Writer ---
+
+_ROW_RE = re.compile(r"<row\b[^>]*?(?:/>|>.*?</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b[^>]*?(?:/>|>.*?</c>)", re.S)
+
+def _attr(tag, name):
+    match = re.search(r"\s" + name + r'="([^"]*)"', tag)
+    return match.group(1) if match else None
+
+def _set_attr(tag, name, value):
+    """Set an attribute on an opening tag (ending in ">" or "/>")."""
+    pattern = r"(\s" + name + r'=")[^"]*(")'
+    if re.search(pattern, tag):
+        return re.sub(pattern, lambda m: m.group(1) + value + m.group(2), tag, count=1)
+    end = -2 if tag.endswith("/>") else -1
+    return f'{tag[:end]} {name}="{value}"{tag[end:]}'
+
+def collect_cell_values(sheet_values, start=0, stats=None):
+    """
+    Return the {(row, column): value} writes fill_template would make,
+    without touching a workbook.
+    """
+    cell_values = {}
+    for i, values in enumerate(sheet_values, start=start):
+        write_start = time.perf_counter()
+        target_col_idx = 3 + i
+        cell_values[(1, target_col_idx)] = i + 1
+        for row_idx, value in values.items():
+            cell_values[(row_idx, target_col_idx)] = value
+        if stats is not None:
+            stats.record_write(time.perf_counter() - write_start, len(values) + 1)
+    return cell_values
+
+def cell_xml(ref, value, style=None):
+    """Serialize one cell; strings are written inline so sharedStrings is untouched."""
+    s_attr = f' s="{style}"' if style else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{s_attr}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s_attr}><v>{value!r}</v></c>'
+    text = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise IllegalCharacterError(f"{text} cannot be used in worksheets.")
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def _patch_row(row_xml, row_idx, cols):
+    if row_xml.endswith("/>"):
+        open_tag, body = row_xml[:-2] + ">", ""
+    else:
+        open_tag = row_xml[:row_xml.index(">") + 1]
+        body = row_xml[len(open_tag):-len("</row>")]
+
+    cells = []
+    col = 0
+    tail_start = 0
+    for match in _CELL_RE.finditer(body):
+        ref = _attr(match.group(0)[:match.group(0).index(">") + 1], "r")
+        col = column_index_from_string(coordinate_from_string(ref)[0]) if ref else col + 1
+        cells.append((col, match.group(0)))
+        tail_start = match.end()
+    tail = body[tail_start:]
+
+    existing = dict(cells)
+    for col, value in cols.items():
+        old = existing.get(col)
+        style = _attr(old[:old.index(">") + 1], "s") if old else None
+        existing[col] = cell_xml(f"{get_column_letter(col)}{row_idx}", value, style)
+
+    spans = _attr(open_tag, "spans")
+    if spans and ":" in spans:
+        low, high = (int(v) for v in spans.split(":"))
+        open_tag = _set_attr(open_tag, "spans", f"{min(low, *cols)}:{max(high, *cols)}")
+    return open_tag + "".join(existing[col] for col in sorted(existing)) + tail + "</row>"
+
+def patch_sheet_xml(xml, cell_values):
+    """Rewrite only the rows of sheetData that receive new cell values."""
+    by_row = {}
+    for (row_idx, col), value in cell_values.items():
+        by_row.setdefault(row_idx, {})[col] = value
+    if not by_row:
+        return xml
+
+    empty = re.search(r"<sheetData\s*/>", xml)
+    if empty:
+        xml = xml[:empty.start()] + "<sheetData></sheetData>" + xml[empty.end():]
+    start = xml.find("<sheetData>")
+    end = xml.find("</sheetData>")
+    if start < 0 or end < 0:
+        raise ValueError("Template sheet has no sheetData element")
+    start += len("<sheetData>")
+    sheet_data = xml[start:end]
+
+    rows = []
+    row_idx = 0
+    for match in _ROW_RE.finditer(sheet_data):
+        ref = _attr(match.group(0)[:match.group(0).index(">") + 1], "r")
+        row_idx = int(ref) if ref else row_idx + 1
+        rows.append((row_idx, match.group(0)))
+
+    patched = dict(rows)
+    for row_idx, cols in by_row.items():
+        patched[row_idx] = _patch_row(patched.get(row_idx, f'<row r="{row_idx}"/>'), row_idx, cols)
+    new_data = "".join(patched[row_idx] for row_idx in sorted(patched))
+
+    dimension = re.search(r'<dimension\s+ref="([^"]*)"\s*/>', xml[:start])
+    if dimension:
+        old_ref = dimension.group(1)
+        if ":" not in old_ref:
+            old_ref = f"{old_ref}:{old_ref}"
+        min_col, min_row, max_col, max_row = range_boundaries(old_ref)
+        cols = [col for row_cols in by_row.values() for col in row_cols]
+        ref = (f"{get_column_letter(min(min_col, *cols))}{min(min_row, *by_row)}:"
+               f"{get_column_letter(max(max_col, *cols))}{max(max_row, *by_row)}")
+        xml_head = xml[:dimension.start(1)] + ref + xml[dimension.end(1):start]
+    else:
+        xml_head = xml[:start]
+    return xml_head + new_data + xml[end:]
+
+def _locate_active_sheet(package):
+    """Find the workbook part, its sheet list and the active sheet's <sheet> tag and zip path."""
+    root_rels = package.read("_rels/.rels").decode("utf-8")
+    workbook_part = "xl/workbook.xml"
+    for rel in re.findall(r"<Relationship\b[^>]*>", root_rels):
+        if (_attr(rel, "Type") or "").endswith("/officeDocument"):
+            workbook_part = _attr(rel, "Target").lstrip("/")
+    base = workbook_part.rsplit("/", 1)[0] if "/" in workbook_part else ""
+
+    workbook_xml = package.read(workbook_part).decode("utf-8")
+    active_tab = re.search(r'<(?:\w+:)?workbookView\b[^>]*?\sactiveTab="(\d+)"', workbook_xml)
+    sheets = re.findall(r"<(?:\w+:)?sheet\b[^>]*>", workbook_xml)
+    index = int(active_tab.group(1)) if active_tab else 0
+    sheet = sheets[index]
+    rel_id = re.search(r'\s\w+:id="([^"]*)"', sheet).group(1)
+
+    rels_part = f"{base}/_rels/{workbook_part.rsplit('/', 1)[-1]}.rels".lstrip("/")
+    for rel in re.findall(r"<Relationship\b[^>]*>", package.read(rels_part).decode("utf-8")):
+        if _attr(rel, "Id") == rel_id:
+            target = _attr(rel, "Target")
+            sheet_part = target.lstrip("/") if target.startswith("/") else f"{base}/{target}".lstrip("/")
+            return {
+                "workbook_part": workbook_part,
+                "workbook_xml": workbook_xml,
+                "rels_part": rels_part,
+                "base": base,
+                "sheets": sheets,
+                "index": index,
+                "sheet": sheet,
+                "sheet_part": sheet_part,
+            }
+    raise ValueError(f"Active sheet relationship {rel_id} not found")
+
+def find_active_sheet_part(package):
+    """Return the zip path of the workbook's active worksheet."""
+    return _locate_active_sheet(package)["sheet_part"]
+
+def patch_xlsx(template_bytes, cell_values):
+    """
+    Write cell values into the template's active sheet and return the xlsx bytes.
+
+    Only the rows receiving values are rewritten in the sheet XML; every
+    other part of the package is copied unchanged.
+    """
+    output = new_output()
+    with zipfile.ZipFile(BytesIO(template_bytes)) as package:
+        sheet_part = find_active_sheet_part(package)
+        with zipfile.ZipFile(output, "w") as patched:
+            for info in package.infolist():
+                data = package.read(info.filename)
+                if info.filename == sheet_part:
+                    data = patch_sheet_xml(data.decode("utf-8"), cell_values).encode("utf-8")
+                patched.writestr(info, data)
+    output.seek(0)
+    return output
+
+def read_template_bytes(template_file):
+    if isinstance(template_file, bytes):
+        return template_file
+    source = read_input_source(template_file)
+    if isinstance(source, bytes):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+def save_workbook(wb, stats=None):
+    """Save a workbook to a new output file, rewound for reading."""
+    output = new_output()
+    with _phase(stats, "save"):
+        wb.save(output)
+    output.seek(0)
+    return output
+
+def write_output(template_wb, template_file, sheet_values, writer="openpyxl", stats=None):
+    """
+    Write per-sheet {row: value} dicts into the template and return the output file.
+
+    writer="fast" patches template_file's package (a path, file or its
+    bytes) and leaves template_wb alone, so it may be None; otherwise the
+    values are filled into template_wb's active sheet and it is saved.
+    """
+    if writer == "fast":
+        cell_values = collect_cell_values(sheet_values, stats=stats)
+        with _phase(stats, "save"):
+            return patch_xlsx(read_template_bytes(template_file), cell_values)
+    fill_template(template_wb.active, sheet_values, stats=stats)
+    return save_workbook(template_wb, stats)
+
+def cached_output(cache, key, stats=None):
+    """Return the cached output for key as a file, or None, recording the hit or miss on stats."""
+    with _phase(stats, "cache_lookup"):
+        data = cache.get_output(key)
+    if stats is not None:
+        stats.cache = "hit" if data is not None else "miss"
+    return BytesIO(data) if data is not None else None
+
+# --- Multi-Sheet Output ---
+
+OUTPUT_LAYOUTS = ("columns", "sheets")
+SHEET_TITLE_LENGTH = 31
+_INVALID_TITLE_RE = re.compile(r"[\\/*?:\[\]]")
+# Relationships a cloned sheet may point at together with the template sheet
+_SHARED_SHEET_RELS = ("/printerSettings", "/hyperlink")
+
+def unique_sheet_title(name, taken):
+    """Make a valid worksheet title from name that is not in taken (compared case-insensitively)."""
+    title = _INVALID_TITLE_RE.sub("_", str(name)).strip("'")[:SHEET_TITLE_LENGTH] or "Sheet"
+    candidate = title
+    n = 1
+    while candidate.casefold() in taken:
+        n += 1
+        suffix = f" ({n})"
+        candidate = title[:SHEET_TITLE_LENGTH - len(suffix)] + suffix
+    taken.add(candidate.casefold())
+    return candidate
+
+def sheet_cell_values(values, number, stats=None):
+    """Return the {(row, column): value} writes of one input sheet in its own output sheet (column C)."""
+    write_start = time.perf_counter()
+    cell_values = {(1, 3): number}
+    for row_idx, value in values.items():
+        cell_values[(row_idx, 3)] = value
+    if stats is not None:
+        stats.record_write(time.perf_counter() - write_start, len(cell_values))
+    return cell_values
+
+def _xml_attr(value):
+    return escape(value, {'"': "&quot;"})
+
+def _sheet_ref(title):
+    """Quoted sheet reference for a defined name, XML-escaped."""
+    return escape("'" + title.replace("'", "''") + "'!")
+
+def _clone_sheet_rels(rels_xml, sheet_xml):
+    """Keep only the relationships a clone can share with the template; drop elements using the others."""
+    dropped = []
+    kept = []
+    for rel in re.findall(r"<Relationship\b[^>]*>", rels_xml):
+        if (_attr(rel, "Type") or "").endswith(_SHARED_SHEET_RELS):
+            kept.append(rel)
+        else:
+            dropped.append(_attr(rel, "Id"))
+    for rel_id in dropped:
+        sheet_xml = re.sub(r'<tableParts\b[^>]*>(?:(?!</tableParts>).)*?\sr:id="' + re.escape(rel_id)
+                           + r'"(?:(?!</tableParts>).)*</tableParts>', "", sheet_xml, flags=re.S)
+        sheet_xml = re.sub(r'<\w+\b[^>]*\sr:id="' + re.escape(rel_id) + r'"[^>]*/>', "", sheet_xml)
+    opening = re.search(r"<Relationships\b[^>]*>", rels_xml)
+    return rels_xml[:opening.end()] + "".join(kept) + "</Relationships>", sheet_xml
+
+def clone_xlsx_sheets(template_bytes, sheets):
+    """
+    Write one copy of the template's active sheet per input sheet.
+
+    sheets is a list of (title, cell_values). The template sheet becomes the
+    first one; the others are added right after it. Each clone's XML is the
+    template sheet's XML with only the rows receiving values rewritten, and
+    it shares the template's styles, shared strings and printer settings,
+    so the cost per sheet is the template sheet XML plus its own values.
+    Sheet-scoped defined names (print areas) are copied to every clone;
+    drawings, comments and tables are not cloned.
+    """
+    output = new_output()
+    with zipfile.ZipFile(BytesIO(template_bytes)) as package:
+        info = _locate_active_sheet(package)
+        names = set(package.namelist())
+        sheet_part = info["sheet_part"]
+        sheet_dir, sheet_file = sheet_part.rsplit("/", 1)
+        sheet_rels_part = f"{sheet_dir}/_rels/{sheet_file}.rels"
+        sheet_xml = package.read(sheet_part).decode("utf-8")
+        sheet_rels = package.read(sheet_rels_part).decode("utf-8") if sheet_rels_part in names else None
+        clone_sheet_xml = re.sub(r'\stabSelected="(?:1|true)"', "", sheet_xml)
+        if sheet_rels is not None:
+            clone_rels, clone_sheet_xml = _clone_sheet_rels(sheet_rels, clone_sheet_xml)
+
+        # Titles, parts, relationship ids and sheet ids for the clones
+        template_title = _attr(info["sheet"], "name")
+        taken = {_attr(tag, "name").casefold() for i, tag in enumerate(info["sheets"]) if i != info["index"]}
+        titles = [unique_sheet_title(title, taken) for title, _ in sheets] or [template_title]
+        workbook_rels = package.read(info["rels_part"]).decode("utf-8")
+        next_rel = 1 + max([int(n) for n in re.findall(r'\sId="rId(\d+)"', workbook_rels)] or [0])
+        next_sheet_id = 1 + max(int(_attr(tag, "sheetId") or 0) for tag in info["sheets"])
+        part_numbers = [int(n) for n in re.findall(re.escape(sheet_dir) + r"/sheet(\d+)\.xml$", "\n".join(names), re.M)]
+        next_part = 1 + max(part_numbers or [0])
+        clones = []
+        for k in range(1, len(titles)):
+            clones.append({
+                "title": titles[k],
+                "part": f"{sheet_dir}/sheet{next_part + k - 1}.xml",
+                "rel_id": f"rId{next_rel + k - 1}",
+                "sheet_id": next_sheet_id + k - 1,
+            })
+
+        # workbook.xml: rename the template sheet, insert the clones after it, copy its defined names
+        workbook_xml = info["workbook_xml"]
+        rel_attr = re.search(r'\s(\w+):id="', info["sheet"]).group(1)
+        first_tag = _set_attr(info["sheet"], "name", _xml_attr(titles[0]))
+        clone_tags = "".join(
+            f'<sheet name="{_xml_attr(clone["title"])}" sheetId="{clone["sheet_id"]}" '
+            f'{rel_attr}:id="{clone["rel_id"]}"/>' for clone in clones
+        )
+        workbook_xml = workbook_xml.replace(info["sheet"], first_tag + clone_tags, 1)
+        # Not preceded by a name character, so "MyDatasheet!" or "[1]Datasheet!" are left alone
+        old_ref = re.compile(r"(?<![\w.'\]])(?:'" + re.escape(escape(template_title.replace("'", "''"))) + r"'|"
+                             + re.escape(escape(template_title)) + r")!")
+
+        def rewrite_name(match):
+            tag, body = match.group(1), match.group(2)
+            local = _attr(tag, "localSheetId")
+            names_xml = f"{tag}{old_ref.sub(lambda m: _sheet_ref(titles[0]), body)}</definedName>"
+            if local is None:
+                return names_xml
+            local = int(local)
+            if local > info["index"]:
+                return f"{_set_attr(tag, 'localSheetId', str(local + len(clones)))}{body}</definedName>"
+            if local == info["index"]:
+                for k, clone in enumerate(clones, start=1):
+                    names_xml += (f"{_set_attr(tag, 'localSheetId', str(local + k))}"
+                                  f"{old_ref.sub(lambda m: _sheet_ref(clone['title']), body)}</definedName>")
+            return names_xml
+
+        workbook_xml = re.sub(r"(<definedName\b[^>]*>)(.*?)</definedName>", rewrite_name, workbook_xml, flags=re.S)
+        active_tab = re.search(r'(<(?:\w+:)?workbookView\b[^>]*?\sactiveTab=")(\d+)"', workbook_xml)
+        if active_tab and int(active_tab.group(2)) > info["index"]:
+            workbook_xml = (workbook_xml[:active_tab.start(2)] + str(int(active_tab.group(2)) + len(clones))
+                            + workbook_xml[active_tab.end(2):])
+
+        rel_target = sheet_part[len(info["base"]) + 1:] if info["base"] else sheet_part
+        rel_dir = rel_target.rsplit("/", 1)[0] + "/" if "/" in rel_target else ""
+        workbook_rels = workbook_rels.replace("</Relationships>", "".join(
+            f'<Relationship Id="{clone["rel_id"]}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="{rel_dir}{clone["part"].rsplit("/", 1)[1]}"/>' for clone in clones
+        ) + "</Relationships>")
+        content_types = package.read("[Content_Types].xml").decode("utf-8").replace("</Types>", "".join(
+            f'<Override PartName="/{clone["part"]}" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for clone in clones
+        ) + "</Types>")
+
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as patched:
+            first_values = sheets[0][1] if sheets else {}
+            for item in package.infolist():
+                if item.filename == sheet_part:
+                    data = patch_sheet_xml(sheet_xml, first_values)
+                elif item.filename == info["workbook_part"]:
+                    data = workbook_xml
+                elif item.filename == info["rels_part"]:
+                    data = workbook_rels
+                elif item.filename == "[Content_Types].xml":
+                    data = content_types
+                else:
+                    patched.writestr(item, package.read(item.filename))
+                    continue
+                patched.writestr(item, data.encode("utf-8"))
+            for clone, (_, cell_values) in zip(clones, sheets[1:]):
+                patched.writestr(clone["part"], patch_sheet_xml(clone_sheet_xml, cell_values).encode("utf-8"))
+                if sheet_rels is not None:
+                    clone_dir, clone_file = clone["part"].rsplit("/", 1)
+                    patched.writestr(f"{clone_dir}/_rels/{clone_file}.rels", clone_rels.encode("utf-8"))
+    output.seek(0)
+    return output
+
+# --- Chunked Pipeline ---
+
+CHUNK_SHEETS = 50
+CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), "excel_autofill_checkpoints")
+
+class Checkpoint:
+    """
+    Extracted cell values of a job's completed chunks, appended to one file.
+
+    Each chunk is a pickle record that is flushed and fsynced before the next
+    chunk is read, so a crash or cancel loses at most the chunk in progress.
+    A torn last record is dropped on load. Runs of the same job must hold
+    lock() while they use the checkpoint.
+    """
+
+    _locks = {}  # path: [thread lock, runs using it]; only jobs running or waiting have an entry
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold this checkpoint exclusively; a second run of the same job waits here.
+
+        Threads are serialized by an in-process lock and processes by flock
+        on a ".lock" file next to the checkpoint, which the OS releases if the
+        holder dies. Without fcntl (Windows) only threads are serialized.
+        """
+        with self._locks_guard:
+            entry = self._locks.setdefault(self.path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0], self._lock_file():
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[self.path]
+
+    @contextmanager
+    def _lock_file(self):
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.path + ".lock"
+        while True:
+            f = open(lock_path, "ab")
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # The previous holder removes the file before unlocking; a waiter left holding it starts over
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(lock_path)):
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    @classmethod
+    def for_job(cls, directory, key):
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.sha256("|".join(key).encode("utf-8")).hexdigest()
+        return cls(os.path.join(directory, f"{name}.ckpt"))
+
+    def iter_sheets(self):
+        """Yield the saved {cell addresses: value} dicts in sheet order, one chunk in memory at a time."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            while True:
+                good = f.tell()
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                except Exception:
+                    # Torn write: keep the complete chunks only
+                    f.close()
+                    with open(self.path, "r+b") as torn:
+                        torn.truncate(good)
+                    return
+                yield from chunk
+
+    def count(self):
+        return sum(1 for _ in self.iter_sheets())
+
+    def append(self, chunk):
+        with open(self.path, "ab") as f:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def _process_chunked(input_file, template_file, mapping_rules, writer, cache, chunk_size, checkpoint_dir, stats):
+    input_source = read_input_source(input_file)
+    key = job_key(input_source, template_file, mapping_rules) if cache is not None or checkpoint_dir else None
+    checkpoint = Checkpoint.for_job(checkpoint_dir, key) if checkpoint_dir else None
+    if checkpoint is None:
+        return _run_chunked(input_source, template_file, mapping_rules, writer, cache, chunk_size, key, None, stats)
+    # A concurrent run of the same job would append its own chunks to the same file
+    with checkpoint.lock():
+        return _run_chunked(input_source, template_file, mapping_rules, writer, cache, chunk_size, key, checkpoint,
+                            stats)
+
+def _run_chunked(input_source, template_file, mapping_rules, writer, cache, chunk_size, key, checkpoint, stats):
+    if cache is not None:
+        # Checked under the checkpoint lock, so a run that waited picks up the output of the one it waited for
+        output = cached_output(cache, key, stats)
+        if output is not None:
+            return output
+
+    with _phase(stats, "load_template"):
+        template_wb = load_template(template_file)
+    with _phase(stats, "compile"):
+        plan = compile_mapping_plan(template_wb.active, mapping_rules, _warnings(stats))
+
+    total_sheets = len(read_sheet_names(input_source))
+    done = checkpoint.count() if checkpoint is not None else 0
+    kept = []  # Without a checkpoint the extracted values stay in memory
+    if done and stats is not None:
+        stats.record_resume(done)
+
+    # One streaming pass over the remaining sheets, saved every chunk_size sheets
+    readers = iter_streaming_sheets(open_input_source(input_source), plan, start=done)
+    chunk = []
+    for index, (cells, errors, read_seconds, extract_seconds) in enumerate(iter_timed_cells(readers, plan), done):
+        if stats is not None:
+            stats.record_sheet(index, read_seconds, extract_seconds, cells, errors)
+        chunk.append(cells)
+        if len(chunk) == chunk_size or index + 1 == total_sheets:
+            if checkpoint is not None:
+                checkpoint.append(chunk)
+            else:
+                kept.extend(chunk)
+            chunk = []
+            if stats is not None:
+                stats.record_chunk(index + 1, total_sheets)
+
+    sheet_cells = checkpoint.iter_sheets() if checkpoint is not None else kept
+    sheet_values = (rows_from_cells(plan, cells) for cells in sheet_cells)
+    output = write_output(template_wb, template_file, sheet_values, writer, stats)
+    if cache is not None:
+        cache.put_output(key, output.getvalue())
+    if checkpoint is not None:
+        checkpoint.remove()
+    return output
+
+# --- Incremental Re-fill ---
+
+def diff_rules(old_rules, new_rules):
+    """Return the labels whose rule lists differ between two mapping rule dicts."""
+    labels = set(old_rules) | set(new_rules)
+    return {label for label in labels if old_rules.get(label) != new_rules.get(label)}
+
+def plan_rows(plan, labels):
+    """Template rows written by the plan entries of the given labels."""
+    return {row_idx for label, writes in plan if label in labels for row_idx, _ in writes}
+
+def refill_template(template_sheet, old_plan, new_plan, labels, extract):
+    """
+    Rewrite only the template rows the given labels touch under either plan.
+
+    Every plan entry writing one of those rows is re-applied, so a Vertical
+    spill overlapping another label still resolves as in a full run.
+    extract(sub_plan) returns the per-sheet cell values of a sub-plan.
+    Returns the rows rewritten.
+    """
+    rows = plan_rows(old_plan, labels) | plan_rows(new_plan, labels)
+    if not rows:
+        return rows
+    sub_plan = tuple(
+        (label, writes) for label, writes in new_plan
+        if any(row_idx in rows for row_idx, _ in writes)
+    )
+    for i, cells in enumerate(extract(sub_plan)):
+        values = rows_from_cells(sub_plan, cells)
+        for row_idx in rows:
+            template_sheet.cell(row=row_idx, column=3 + i).value = values.get(row_idx)
+    return rows
+
+def _process_with_cache(input_file, template_file, mapping_rules, engine, workers, writer, cache, stats):
+    with _phase(stats, "cache_lookup"):
+        input_source = read_input_source(input_file)
+        key = cache.make_key(input_source, template_file, mapping_rules)
+    output = cached_output(cache, key, stats)
+    if output is not None:
+        return output
+    input_file = open_input_source(input_source)
+
+    def extract(plan):
+        return cache.extract(key[0], input_file, plan, engine, workers, stats)
+
+    # The fast writer never fills a live workbook, so it has none to re-fill
+    previous = cache.take_filled(key) if writer != "fast" else None
+    if previous is not None:
+        if stats is not None:
+            stats.cache = "refill"
+        old_rules, template_wb = previous
+        template_sheet = template_wb.active
+        with _phase(stats, "compile"):
+            plan = compile_mapping_plan(template_sheet, mapping_rules, _warnings(stats))
+            old_plan = compile_mapping_plan(template_sheet, old_rules)
+        with _phase(stats, "refill"):
+            refill_template(template_sheet, old_plan, plan, diff_rules(old_rules, mapping_rules), extract)
+        output = save_workbook(template_wb, stats)
+    else:
+        with _phase(stats, "load_template"):
+            template_wb = load_template(template_file)
+        with _phase(stats, "compile"):
+            plan = compile_mapping_plan(template_wb.active, mapping_rules, _warnings(stats))
+        output = write_output(template_wb, template_file, (rows_from_cells(plan, cells) for cells in extract(plan)),
+                              writer, stats)
+
+    data = output.getvalue()
+    cache.put_output(key, data)
+    if writer != "fast":
+        cache.put_filled(key, mapping_rules, template_wb, len(data))
+    return output
+
+def _process(input_file, template_file, mapping_rules, engine, workers, writer, stats):
+    with _phase(stats, "load_template"):
+        template_wb = load_template(template_file)
+    with _phase(stats, "compile"):
+        plan = compile_mapping_plan(template_wb.active, mapping_rules, _warnings(stats))
+    sheet_values = iter_sheet_values(input_file, plan, engine, workers, stats)
+    return write_output(template_wb, template_file, sheet_values, writer, stats)
+
+def _process_sheets(input_file, template_file, mapping_rules, engine, workers, cache, stats):
+    input_source = read_input_source(input_file)
+    if cache is not None:
+        with _phase(stats, "cache_lookup"):
+            key = cache.make_key(input_source, template_file, mapping_rules, layout="sheets")
+        output = cached_output(cache, key, stats)
+        if output is not None:
+            return output
+
+    with _phase(stats, "load_template"):
+        template_sheet = load_template(template_file).active
+    with _phase(stats, "compile"):
+        plan = compile_mapping_plan(template_sheet, mapping_rules, _warnings(stats))
+    if cache is not None:
+        sheet_cells = cache.extract(key[0], open_input_source(input_source), plan, engine, workers, stats)
+    else:
+        sheet_cells = iter_sheet_cells(open_input_source(input_source), plan, engine, workers, stats)
+
+    sheets = []
+    for i, (sheet_name, cells) in enumerate(zip(read_sheet_names(input_source), sheet_cells)):
+        sheets.append((sheet_name, sheet_cell_values(rows_from_cells(plan, cells), i + 1, stats)))
+    with _phase(stats, "save"):
+        output = clone_xlsx_sheets(read_template_bytes(template_file), sheets)
+    if cache is not None:
+        cache.put_output(key, output.getvalue())
+    return output
+
+def process_excel(input_file, template_file, mapping_rules, engine="standard", workers=1, cache=None,
+                  writer="openpyxl", stats=None, layout="columns", chunk_size=None, checkpoint_dir=None):
+    """
+    Fill the template with one column per input sheet.
+
+    engine="streaming" reads the input in read-only mode and keeps only the
+    cells the mapping needs, which keeps memory low on large workbooks.
+    workers > 1 extracts the sheets in a process pool (None uses every CPU);
+    the output is the same as the serial path. With a ResultCache, identical
+    input, template and rules return the previous output, and a rules change
+    re-reads only the cells that are not cached yet and rewrites only the
+    rows of the labels whose rules changed. writer="fast" patches the new
+    cells into the template's sheet XML and copies the rest of the package
+    unchanged instead of re-serializing the whole workbook. Pass a JobStats
+    as stats to collect timings, counts and errors for the job.
+
+    layout="sheets" writes one copy of the template sheet per input sheet
+    instead, named after it, with the values in column C. The copies are
+    made at the package level (see clone_xlsx_sheets), so writer does not
+    apply to this layout.
+
+    chunk_size (or checkpoint_dir) switches to the chunked pipeline: the
+    input is streamed once and a "chunk" event is emitted every chunk_size
+    sheets (default CHUNK_SHEETS). With checkpoint_dir, each completed chunk
+    is also saved there, and a failed or cancelled run with the same input,
+    template and rules resumes after the last saved chunk; the extracted
+    values are then written from the checkpoint rather than kept in memory.
+    A second run of the same job waits until the first one has finished.
+    engine and workers do not apply, and neither does incremental re-fill.
+    Only extraction runs in flat memory: the default openpyxl writer still
+    builds every column in the live template, so pair it with writer="fast"
+    to keep the write flat too.
+    """
+    if writer not in ("openpyxl", "fast"):
+        raise ValueError(f"Unknown writer: {writer}")
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unknown output layout: {layout}")
+    if stats is not None:
+        stats.input_bytes = input_size(input_file)
+
+    if (chunk_size or checkpoint_dir) and layout != "columns":
+        raise ValueError("Chunked processing only supports the columns layout")
+
+    if chunk_size or checkpoint_dir:
+        output = _process_chunked(input_file, template_file, mapping_rules, writer, cache,
+                                  chunk_size or CHUNK_SHEETS, checkpoint_dir, stats)
+    elif layout == "sheets":
+        output = _process_sheets(input_file, template_file, mapping_rules, engine, workers, cache, stats)
+    elif cache is not None:
+        output = _process_with_cache(input_file, template_file, mapping_rules, engine, workers, writer, cache, stats)
+    else:
+        output = _process(input_file, template_file, mapping_rules, engine, workers, writer, stats)
+
+    if stats is not None:
+        stats.finish()
+    return output
+
+# --- Columnar Extraction ---
+
+TABLE_FORMATS = ("csv", "parquet", "arrow")
+
+# A number, optionally with thousands separators, then an optional unit
+# starting with a letter or symbol ("1,250.5 kW", "-12 °C", "3.5 kgf/cm2G").
+# A unit may not contain another whitespace-separated number ("500 x 3000",
+# "5 mm (2 in)"), so such values keep their column as text.
+VALUE_RE = (r"^\s*(?P<number>[-+]?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)"
+            r"\s*(?P<unit>(?:[^\W\d_]|[°%µ(\[])(?:(?!\s+[-+(\[]?\.?\d)[^\n])*?)?\s*$")
+INT64_DIGITS = str(2 ** 63 - 1)
+
+def compile_table_columns(mapping_rules, typed=False):
+    """
+    Resolve the rules to table columns, independent of any template.
+
+    Returns (plan, columns): a plan with one entry per label occurrence, and
+    a list of (column name, cell addresses). A label with several rules gets
+    one column per occurrence ("Fluid Name #2"); a Vertical rule gets an In
+    and an Out column. With typed=True, a Merge rule gets one column per
+    cell ("Size [2]") instead of one joined column.
+    """
+    validate_rules(mapping_rules)
+    plan = []
+    columns = []
+    for label, rules in mapping_rules.items():
+        for occurrence, rule in enumerate(rules, start=1):
+            name = f"{label} #{occurrence}" if len(rules) > 1 else label
+            if typed and isinstance(rule, list) and len(rule) > 1:
+                writes = tuple((0, (addr,)) for addr in rule)
+                plan.append((label, writes))
+                for part, (_, addrs) in enumerate(writes, start=1):
+                    columns.append((f"{name} [{part}]", addrs))
+                continue
+            writes = rule_writes(rule, 0)
+            plan.append((label, writes))
+            if isinstance(rule, dict) and rule.get("action") == "vertical":
+                for part, (_, addrs) in zip(("In", "Out"), writes):
+                    columns.append((f"{name} {part}", addrs))
+            else:
+                columns.append((name, writes[0][1]))
+    return tuple(plan), columns
+
+def type_column(values):
+    """
+    Parse one extracted text column into numbers and units, in one vectorized pass.
+
+    Returns (values, units). If every non-empty value is a number with an
+    optional unit ("100", "1,250.5 kW"), values is an Int64 or Float64
+    column and units holds the unit strings (or None if there are none).
+    Otherwise the column is returned unchanged with units None.
+    """
+    import pandas as pd
+
+    text = values.astype("string").str.strip()
+    present = text.notna() & (text != "")
+    if not present.any():
+        return values, None
+    parts = text.str.extract(VALUE_RE)
+    if parts["number"][present].isna().any():
+        return values, None
+    numbers = parts["number"].where(present).str.replace(",", "", regex=False)
+    if numbers[present].str.contains(r"[.eE]").any():
+        numeric = pd.to_numeric(numbers).astype("Float64")
+    else:
+        # Integers past int64 (long tag or serial numbers) would wrap or lose digits
+        digits = numbers[present].str.lstrip("+-").str.lstrip("0")
+        if ((digits.str.len() > 19) | ((digits.str.len() == 19) & (digits > INT64_DIGITS))).any():
+            return values, None
+        numeric = pd.to_numeric(numbers).astype("Int64")
+    units = parts["unit"].where(present)
+    return numeric, (units if units.notna().any() else None)
+
+def type_table(table):
+    """Apply type_column to every column but "Sheet", adding a "<column> unit" column where units were found."""
+    import pandas as pd
+
+    columns = {}
+    for name in table.columns:
+        if name == "Sheet":
+            columns[name] = table[name]
+            continue
+        columns[name], units = type_column(table[name])
+        if units is not None:
+            columns[f"{name} unit"] = units
+    return pd.DataFrame(columns, index=table.index)
+
+def _table_cells(input_file, plan, engine, workers, cache, stats):
+    """Return (sheet names, iterator of {cell addresses: value} dicts) for one input."""
+    source = read_input_source(input_file)
+    sheet_names = read_sheet_names(source)
+    if cache is not None:
+        sheet_cells = cache.extract(content_hash(source), open_input_source(source), plan, engine, workers, stats)
+    else:
+        sheet_cells = iter_sheet_cells(open_input_source(source), plan, engine, workers, stats)
+    return sheet_names, sheet_cells
+
+def extract_table(input_file, mapping_rules, engine="standard", workers=1, cache=None, stats=None, typed=False):
+    """
+    Extract the mapped values as a DataFrame, without building the xlsx.
+
+    One row per input sheet ("Sheet" holds its name) and one column per
+    label occurrence, with Vertical rules split into In and Out columns.
+    Cells that could not be read are left empty.
+
+    With typed=True, Merge rules are split into one column per cell and
+    every column is passed through type_column, so numeric columns come
+    back as numbers with their units in a separate column.
+    """
+    import pandas as pd
+
+    if stats is not None:
+        stats.input_bytes = input_size(input_file)
+    plan, columns = compile_table_columns(mapping_rules, typed=typed)
+    sheet_names, sheet_cells = _table_cells(input_file, plan, engine, workers, cache, stats)
+
+    records = []
+    for sheet_name, cells in zip(sheet_names, sheet_cells):
+        record = {"Sheet": sheet_name}
+        for name, addrs in columns:
+            record[name] = cells.get(addrs)
+        records.append(record)
+    table = pd.DataFrame(records, columns=["Sheet"] + [name for name, _ in columns])
+    if typed:
+        with _phase(stats, "type"):
+            table = type_table(table)
+    if stats is not None:
+        stats.finish()
+    return table
+
+def export_table(df, target, fmt="csv"):
+    """
+    Write an extracted table as CSV, Parquet or Arrow (Feather).
+
+    Parquet and Arrow need pyarrow installed.
+    """
+    if fmt == "csv":
+        df.to_csv(target, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(target, index=False)
+    elif fmt == "arrow":
+        df.to_feather(target)
+    else:
+        raise ValueError(f"Unknown table format: {fmt}")
+
+# --- Revision Diff ---
+
+DIFF_KEY_LABEL = "Item No."
+
+def revision_name(input_file, index):
+    """Display name of one compared input: its file name, or "Rev <n>"."""
+    name = input_file if isinstance(input_file, (str, os.PathLike)) else getattr(input_file, "name", None)
+    return os.path.basename(name) if name else f"Rev {index + 1}"
+
+def compare_revisions(input_files, mapping_rules, key_label=DIFF_KEY_LABEL, names=None,
+                      engine="streaming", workers=1, cache=None, stats=None):
+    """
+    Compare the mapped values of two or more revisions of the same workbook.
+
+    Sheets are aligned by the value of key_label (by default "Item No.",
+    AV8), falling back to the sheet name when that cell is empty. Only the
+    compact extracted values of one workbook are held at a time, never the
+    workbooks themselves, as long as engine is "streaming" (the default).
+
+    Returns a DataFrame with one row per (item, column) pair: the key, the
+    "Label" (a table column as named by extract_table), one column of
+    values per revision (None where the item is missing from a revision)
+    and "Changed", ignoring surrounding whitespace. Use diff_matrix for an items x labels overview.
+    """
+    import pandas as pd
+
+    if len(input_files) < 2:
+        raise ValueError("compare_revisions needs at least two input workbooks")
+    names = list(names) if names is not None else [revision_name(f, i) for i, f in enumerate(input_files)]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Revision names must be unique: {names}")
+    if key_label not in mapping_rules:
+        raise ValueError(f"No mapping rule for the key label {key_label!r}")
+
+    plan, columns = compile_table_columns(mapping_rules)
+    key_addrs = next(writes[0][1] for label, writes in plan if label == key_label)
+    revisions = {}
+    for name, input_file in zip(names, input_files):
+        items = {}
+        sheet_names, sheet_cells = _table_cells(input_file, plan, engine, workers, cache, stats)
+        for sheet_name, cells in zip(sheet_names, sheet_cells):
+            key = (cells.get(key_addrs) or "").strip() or sheet_name
+            if key in items:
+                if stats is not None:
+                    stats.warnings.append(f"{name}: duplicate {key_label} {key!r} in sheet '{sheet_name}' ignored")
+                continue
+            items[key] = [cells.get(addrs) for _, addrs in columns]
+        revisions[name] = items
+
+    keys = list(dict.fromkeys(key for items in revisions.values() for key in items))
+    labels = [label for label, _ in columns]
+    index = pd.MultiIndex.from_product([keys, labels], names=[key_label, "Label"])
+    missing = [None] * len(labels)
+    report = pd.DataFrame({
+        name: [value for key in keys for value in items.get(key, missing)]
+        for name, items in revisions.items()
+    }, index=index, dtype=object)
+    # Surrounding whitespace is not a change; a missing item is
+    compared = report[names].apply(lambda values: values.astype("string").str.strip().fillna("\0"))
+    compared = compared.to_numpy(dtype=object)
+    report["Changed"] = (compared != compared[:, :1]).any(axis=1)
+    if stats is not None:
+        stats.finish()
+    return report.reset_index()
+
+def diff_matrix(report, key_label=DIFF_KEY_LABEL):
+    """Pivot a compare_revisions report to an items x labels table of Changed flags."""
+    matrix = report.pivot(index=key_label, columns="Label", values="Changed")
+    return matrix.reindex(index=report[key_label].unique(), columns=report["Label"].unique())
+
+# --- Template Registry ---
+
+REGISTRY_FILE = "templates.json"
+
+def normalize_anchor(value):
+    return " ".join(str(value).split()).casefold() if value is not None else ""
+
+class Layout:
+    """One input layout: the anchor cell values that identify it, and its template and rules."""
+
+    def __init__(self, name, template_file, mapping_rules=None, anchors=None):
+        self.name = name
+        self.template_file = template_file
+        self.mapping_rules = validate_rules(DEFAULT_MAPPING_RULES if mapping_rules is None else mapping_rules)
+        self.anchors = {addr: normalize_anchor(value) for addr, value in (anchors or {}).items()}
+        for addr in self.anchors:
+            parse_address(addr)
+        self.anchor_addrs = tuple(sorted(self.anchors, key=parse_address))
+        self.fingerprint = tuple(self.anchors[addr] for addr in self.anchor_addrs)
+
+class TemplateRegistry:
+    """
+    Templates and rule sets for several input layouts.
+
+    Each input sheet is fingerprinted by the values of its layout's anchor
+    cells. Layouts are grouped by anchor addresses and each group keeps a
+    {fingerprint: layout} dict, so matching a sheet is one dict lookup per
+    group. Groups with more anchors are tried first; a layout without
+    anchors matches any sheet no other layout claims.
+    """
+
+    def __init__(self, layouts=()):
+        self.layouts = []
+        self._groups = {}
+        for layout in layouts:
+            self.add(layout)
+
+    def add(self, layout):
+        if any(existing.name == layout.name for existing in self.layouts):
+            raise ValueError(f"Duplicate layout name: {layout.name}")
+        index = self._groups.setdefault(layout.anchor_addrs, {})
+        if layout.fingerprint in index:
+            raise ValueError(f"Layouts {index[layout.fingerprint].name} and {layout.name} have the same anchors")
+        index[layout.fingerprint] = layout
+        self._groups = dict(sorted(self._groups.items(), key=lambda group: -len(group[0])))
+        self.layouts.append(layout)
+        return layout
+
+    def register(self, name, template_file, mapping_rules=None, anchors=None):
+        return self.add(Layout(name, template_file, mapping_rules, anchors))
+
+    def anchor_plan(self):
+        """Plan entries that make the extraction read every anchor cell."""
+        addrs = sorted({addr for group in self._groups for addr in group}, key=parse_address)
+        return tuple(("(anchor)", ((0, (addr,)),)) for addr in addrs)
+
+    def match(self, cells):
+        """Return the layout of a sheet from its extracted {cell addresses: value}, or None."""
+        for anchor_addrs, index in self._groups.items():
+            fingerprint = tuple(normalize_anchor(cells.get((addr,))) for addr in anchor_addrs)
+            layout = index.get(fingerprint)
+            if layout is not None:
+                return layout
+        return None
+
+def load_registry(path=REGISTRY_FILE):
+    """
+    Read a registry manifest.
+
+    The manifest is {"layouts": [{"name", "template", "rules", "anchors"}]},
+    where rules is a rules dict, a path to a rules JSON file or omitted for
+    the default rules. Paths are relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    registry = TemplateRegistry()
+    for entry in manifest.get("layouts", []):
+        rules = entry.get("rules")
+        if isinstance(rules, str):
+            rules = load_rules(os.path.join(base, rules))
+        registry.register(entry["name"], os.path.join(base, entry["template"]), rules, entry.get("anchors"))
+    return registry
+
+def find_registry_file():
+    return REGISTRY_FILE if os.path.exists(REGISTRY_FILE) else None
+
+def process_layouts(input_file, registry, engine="standard", workers=1, writer="openpyxl", stats=None):
+    """
+    Fill each layout's template from the input sheets that match it, in one pass over the input.
+
+    Every sheet is read once for the anchor cells and the cells of all
+    layouts' rules, then laid out with the plan of the layout it matched.
+    Returns ({layout name: output file}, [unmatched sheet names]); layouts
+    no sheet matched produce no output.
+    """
+    if writer not in ("openpyxl", "fast"):
+        raise ValueError(f"Unknown writer: {writer}")
+    if stats is not None:
+        stats.input_bytes = input_size(input_file)
+    source = read_input_source(input_file)
+    sheet_names = read_sheet_names(source)
+
+    templates = {}
+    plans = {}
+    with _phase(stats, "load_template"):
+        for layout in registry.layouts:
+            templates[layout.name] = load_template(layout.template_file)
+    with _phase(stats, "compile"):
+        for layout in registry.layouts:
+            warnings = []
+            plans[layout.name] = compile_mapping_plan(templates[layout.name].active, layout.mapping_rules, warnings)
+            if stats is not None:
+                stats.warnings.extend(f"{layout.name}: {message}" for message in warnings)
+    plan = registry.anchor_plan() + tuple(entry for layout_plan in plans.values() for entry in layout_plan)
+
+    sheet_values = {layout.name: [] for layout in registry.layouts}
+    unmatched = []
+    for sheet_name, cells in zip(sheet_names, iter_sheet_cells(open_input_source(source), plan, engine, workers, stats)):
+        layout = registry.match(cells)
+        if layout is None:
+            unmatched.append(sheet_name)
+            continue
+        sheet_values[layout.name].append(rows_from_cells(plans[layout.name], cells))
+
+    outputs = {}
+    for layout in registry.layouts:
+        if not sheet_values[layout.name]:
+            continue
+        outputs[layout.name] = write_output(templates[layout.name], layout.template_file,
+                                            sheet_values[layout.name], writer, stats)
+
+    if stats is not None:
+        stats.finish()
+    return outputs, unmatched
+
+# --- Rule Store ---
+
+RULE_STORE_PATH = "rule_sets.db"
+
+_RULE_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rule_sets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    rules TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    UNIQUE (name, version)
+);
+CREATE TABLE IF NOT EXISTS plans (
+    rule_set_id INTEGER NOT NULL REFERENCES rule_sets (id) ON DELETE CASCADE,
+    labels TEXT NOT NULL,
+    plan BLOB NOT NULL,
+    PRIMARY KEY (rule_set_id, labels)
+);
+"""
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("a stored RuleSet is read-only; save a new version instead")
+
+class RuleSet(dict):
+    """
+    One stored version of a named rule set, usable wherever a mapping rules dict is.
+
+    Versions never change once saved, so the canonical rules key and its hash
+    are kept instead of recomputed, and compiled plans are looked up per
+    template (by its labels) in memory, then in the store, before compiling.
+    """
+
+    __setitem__ = __delitem__ = update = pop = popitem = clear = setdefault = _read_only
+
+    def __init__(self, store, id, name, version, key, digest, note="", created=None, plans=None):
+        super().__init__(json.loads(key))
+        self.store = store
+        self.id = id
+        self.name = name
+        self.version = version
+        self.key = key
+        self.digest = digest
+        self.note = note
+        self.created = created
+        self._plans = plans or {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Pickles (e.g. for worker processes) as the plain rules dict
+        return dict, (dict(self),)
+
+    @property
+    def label(self):
+        return f"{self.name} v{self.version}"
+
+    def compiled_plan(self, labels):
+        """Return (plan, warnings) for a template's labels, compiling and storing it on first use."""
+        labels_key = json.dumps(labels, ensure_ascii=False)
+        with self._lock:
+            compiled = self._plans.get(labels_key)
+        if compiled is None:
+            compiled = _compile_plan(labels, self.key)
+            with self._lock:
+                self._plans[labels_key] = compiled
+            self.store._save_plan(self.id, labels_key, compiled)
+        return compiled
+
+class RuleStore:
+    """
+    Named, versioned mapping rule sets in a local SQLite file.
+
+    save() validates the rules and appends a new version (or returns the
+    latest one if nothing changed); load() returns a RuleSet with the plans
+    compiled for it so far. Loaded versions are kept in memory, so sessions
+    sharing a store share their compiled plans too.
+    """
+
+    _COLUMNS = "id, name, version, rules, digest, note, created"
+
+    def __init__(self, path=RULE_STORE_PATH):
+        self.path = path
+        self._loaded = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_RULE_STORE_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _rule_set(self, row):
+        id, name, version, key, digest, note, created = row
+        with self._lock:
+            rule_set = self._loaded.get(id)
+        if rule_set is None:
+            with self._connect() as conn:
+                plans = {labels: pickle.loads(plan) for labels, plan in
+                         conn.execute("SELECT labels, plan FROM plans WHERE rule_set_id = ?", (id,))}
+            rule_set = RuleSet(self, id, name, version, key, digest, note, created, plans)
+            with self._lock:
+                rule_set = self._loaded.setdefault(id, rule_set)
+        return rule_set
+
+    def _save_plan(self, rule_set_id, labels_key, compiled):
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO plans (rule_set_id, labels, plan) VALUES (?, ?, ?)",
+                         (rule_set_id, labels_key, pickle.dumps(compiled, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def save(self, name, mapping_rules, note=""):
+        """Store mapping_rules as the next version of name and return it as a RuleSet."""
+        name = name.strip() if isinstance(name, str) else ""
+        if not name:
+            raise ValueError("a rule set needs a name")
+        key = rules_key(validate_rules(mapping_rules))
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        with self._connect() as conn:
+            latest = conn.execute(f"SELECT {self._COLUMNS} FROM rule_sets WHERE name = ? "
+                                  "ORDER BY version DESC LIMIT 1", (name,)).fetchone()
+            if latest is None or latest[4] != digest:
+                cursor = conn.execute(
+                    "INSERT INTO rule_sets (name, version, rules, digest, note, created) "
+                    "SELECT ?, COALESCE(MAX(version), 0) + 1, ?, ?, ?, ? FROM rule_sets WHERE name = ?",
+                    (name, key, digest, note, time.time(), name))
+                latest = conn.execute(f"SELECT {self._COLUMNS} FROM rule_sets WHERE id = ?",
+                                      (cursor.lastrowid,)).fetchone()
+        return self._rule_set(latest)
+
+    def load(self, name, version=None):
+        """Return a version of name (the latest by default), or raise KeyError."""
+        with self._connect() as conn:
+            if version is None:
+                row = conn.execute(f"SELECT {self._COLUMNS} FROM rule_sets WHERE name = ? "
+                                   "ORDER BY version DESC LIMIT 1", (name,)).fetchone()
+            else:
+                row = conn.execute(f"SELECT {self._COLUMNS} FROM rule_sets WHERE name = ? AND version = ?",
+                                   (name, int(version))).fetchone()
+        if row is None:
+            raise KeyError(f"no rule set {name!r}" + (f" version {version}" if version is not None else ""))
+        return self._rule_set(row)
+
+    def latest(self):
+        """Return the most recently saved rule set, or None if the store is empty."""
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {self._COLUMNS} FROM rule_sets ORDER BY created DESC, id DESC LIMIT 1").fetchone()
+        return self._rule_set(row) if row else None
+
+    def names(self):
+        with self._connect() as conn:
+            return [name for (name,) in conn.execute("SELECT DISTINCT name FROM rule_sets ORDER BY name")]
+
+    def versions(self, name):
+        """List the versions of name, newest first, as dicts of version, note and created."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT version, note, created FROM rule_sets WHERE name = ? ORDER BY version DESC",
+                                (name,)).fetchall()
+        return [{"version": version, "note": note, "created": created} for version, note, created in rows]
+
+# --- Job Queue ---
+
+JOB_WORKERS = 2
+JOB_QUEUE_SIZE = 8
+JOB_HISTORY = 32
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """
+    State of one background job.
+
+    status moves from "queued" to "running" and ends as "done", "failed" or
+    "cancelled". Only the worker thread updates it; readers just poll.
+    """
+
+    def __init__(self, name, total_sheets=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "queued"
+        self.total_sheets = total_sheets
+        self.sheets_done = 0
+        self.sheets_checkpointed = 0
+        self.result = None
+        self.error = None
+        self.stats = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._future = None
+        self._cleanup = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def wait(self, timeout=None):
+        """Block until the job has finished or timeout seconds have passed; return whether it finished."""
+        return self._finished.wait(timeout)
+
+    @property
+    def progress(self):
+        """Fraction of sheets extracted so far, between 0 and 1."""
+        if self.status == "done":
+            return 1.0
+        if not self.total_sheets:
+            return 0.0
+        return min(self.sheets_done / self.total_sheets, 1.0)
+
+class JobQueue:
+    """
+    Runs processing jobs on a small thread pool so callers do not block.
+
+    At most max_pending jobs may wait for a worker; submitting more raises
+    RuntimeError. Finished jobs and their results stay available by id until
+    more than history of them have finished, oldest first out. Jobs run in
+    threads of this process so they share the template and result caches.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_QUEUE_SIZE, history=JOB_HISTORY):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.max_pending = max_pending
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, name="", total_sheets=None, cleanup=None, **kwargs):
+        """
+        Queue func(*args, stats=JobStats, **kwargs) and return its Job.
+
+        func is expected to report progress through the JobStats it is
+        given, like process_excel and extract_table do. cleanup, if given,
+        is called once the job has finished, was cancelled or failed, e.g.
+        to remove a spooled upload.
+        """
+        job = Job(name, total_sheets)
+        job._cleanup = cleanup
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status == "queued")
+            if pending >= self.max_pending:
+                raise RuntimeError(f"Job queue is full ({pending} jobs waiting). Try again later.")
+            self._jobs[job.id] = job
+            job._future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop. A queued job never starts; a running one stops at
+        its next sheet or phase boundary. Returns False if it already finished.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel.set()
+        if job._future.cancel():
+            self._finish(job, "cancelled")
+        return True
+
+    def shutdown(self, wait=True):
+        for job in self.jobs():
+            job._cancel.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _on_event(self, job, event, payload):
+        if event != "done" and job._cancel.is_set():
+            raise JobCancelled(job.id)
+        if event == "sheet":
+            job.sheets_done += 1
+        elif event == "resume":
+            job.sheets_done += payload["sheets"]
+        elif event == "chunk":
+            job.sheets_checkpointed = payload["sheets_done"]
+
+    def _run(self, job, func, args, kwargs):
+        if job._cancel.is_set():
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        stats = JobStats(on_event=lambda event, payload: self._on_event(job, event, payload))
+        try:
+            job.result = func(*args, stats=stats, **kwargs)
+            status = "done"
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            status = "failed"
+        job.stats = stats.to_dict()
+        self._finish(job, status)
+
+    def _finish(self, job, status):
+        if job._cleanup is not None:
+            job._cleanup()
+        job.finished_at = time.time()
+        job.status = status
+        job._finished.set()
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.finished]
+            for old in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[old.id]
+
+# --- Command Line ---
+
+def load_rules(path):
+    """Read and validate mapping rules from a JSON file, or return the defaults when path is None."""
+    if not path:
+        return DEFAULT_MAPPING_RULES
+    with open(path, encoding="utf-8") as f:
+        return validate_rules(json.load(f))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine", description="Fill the template from one input workbook.")
+    parser.add_argument("input", nargs="+", help="Input workbook (several with --diff)")
+    parser.add_argument("-o", "--output", help="Output file (default: processed_output.xlsx or extracted_data.<table>)")
+    parser.add_argument("--template", help="Template workbook (default: template found in the current directory)")
+    rules = parser.add_mutually_exclusive_group()
+    rules.add_argument("--rules", help="Mapping rules JSON (default: built-in rules)")
+    rules.add_argument("--rule-set", metavar="NAME[@VERSION]",
+                       help="Stored rule set, latest version unless one is given (see --rule-store)")
+    parser.add_argument("--rule-store", default=RULE_STORE_PATH, help=f"Rule set store (default: {RULE_STORE_PATH})")
+    parser.add_argument("--engine", choices=["standard", "streaming"],
+                        help="Input engine (default: streaming with --diff, standard otherwise)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = all CPUs)")
+    parser.add_argument("--writer", choices=["openpyxl", "fast"], default="openpyxl",
+                        help="fast patches the template's sheet XML instead of re-saving the workbook")
+    parser.add_argument("--layout", choices=OUTPUT_LAYOUTS, default="columns",
+                        help="sheets writes one template sheet per input sheet instead of one column per sheet")
+    parser.add_argument("--table", choices=TABLE_FORMATS,
+                        help="Write the extracted values as a table in this format instead of filling the template")
+    parser.add_argument("--typed", action="store_true",
+                        help="With --table: split Merge rules and parse numbers and units into typed columns")
+    parser.add_argument("--registry", help=f"Layout registry manifest: fill each matching layout's template "
+                                           f"(e.g. {REGISTRY_FILE}); outputs are named <output>_<layout>.xlsx")
+    parser.add_argument("--chunk-size", type=int,
+                        help="Stream the input and checkpoint every N sheets; rerun the same command to resume "
+                             "after a failure (checkpoints in --checkpoint-dir)")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help=f"Default: {CHECKPOINT_DIR}")
+    parser.add_argument("--diff", action="store_true",
+                        help=f"Compare the inputs as revisions, aligned by {DIFF_KEY_LABEL!r}, and write the "
+                             f"per-label diff as a table in the --table format (default: revision_diff.csv)")
+    parser.add_argument("--stats", help="Also write the job's diagnostics to this JSON file")
+    args = parser.parse_args(argv)
+    if args.diff and len(args.input) < 2:
+        parser.error("--diff needs at least two input workbooks")
+    if not args.diff and len(args.input) > 1:
+        parser.error("Several input workbooks are only supported with --diff")
+    input_file = args.input[0]
+
+    if args.rule_set:
+        name, _, version = args.rule_set.rpartition("@") if "@" in args.rule_set else (args.rule_set, "", "")
+        try:
+            mapping_rules = RuleStore(args.rule_store).load(name, int(version) if version else None)
+        except (KeyError, ValueError) as e:
+            parser.error(f"--rule-set: {e.args[0]}")
+    else:
+        mapping_rules = load_rules(args.rules)
+    workers = args.workers or None
+    if args.engine is None:
+        args.engine = "streaming" if args.diff else "standard"
+    stats = JobStats()
+
+    if args.diff:
+        output = args.output or f"revision_diff.{args.table or 'csv'}"
+        report = compare_revisions(args.input, mapping_rules, engine=args.engine, workers=workers, stats=stats)
+        export_table(report, output, args.table or "csv")
+        changed = report.loc[report["Changed"], DIFF_KEY_LABEL].nunique()
+        print(f"{changed} of {report[DIFF_KEY_LABEL].nunique()} items changed")
+    elif args.registry:
+        stem = os.path.splitext(args.output or "processed_output.xlsx")[0]
+        results, unmatched = process_layouts(input_file, load_registry(args.registry), engine=args.engine,
+                                             workers=workers, writer=args.writer, stats=stats)
+        for name, result in results.items():
+            with open(f"{stem}_{name}.xlsx", "wb") as f:
+                shutil.copyfileobj(result, f, SPOOL_CHUNK_BYTES)
+        output = ", ".join(f"{stem}_{name}.xlsx" for name in results) or "no output"
+        if unmatched:
+            print(f"No layout matched: {', '.join(unmatched)}")
+    elif args.table:
+        output = args.output or f"extracted_data.{args.table}"
+        table = extract_table(input_file, mapping_rules, engine=args.engine, workers=workers, stats=stats,
+                              typed=args.typed)
+        export_table(table, output, args.table)
+    else:
+        template_file = args.template or find_template_file()
+        if not template_file:
+            parser.error("No template file found. Pass one with --template.")
+        output = args.output or "processed_output.xlsx"
+        result = process_excel(input_file, template_file, mapping_rules, engine=args.engine, workers=workers,
+                               writer=args.writer, stats=stats, layout=args.layout, chunk_size=args.chunk_size,
+                               checkpoint_dir=args.checkpoint_dir if args.chunk_size else None)
+        with open(output, "wb") as f:
+            result.seek(0)
+            shutil.copyfileobj(result, f, SPOOL_CHUNK_BYTES)
+
+    if args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            f.write(stats.to_json())
+    print(f"{', '.join(args.input)} -> {output} ({len(stats.sheets)} sheets, {stats.to_dict()['total_seconds']:.2f}s, "
+          f"{len(stats.errors)} errors, {len(stats.warnings)} warnings)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,219 @@
+"""
+Load test: drive process_excel with concurrent simulated sessions.
+
+Usage:
+    python loadtest.py                                   # 4 sessions x 3 requests, 10-sheet inputs
+    python loadtest.py --sessions 8 --requests 5 --sheets 10 100 --workers 2 4
+    python loadtest.py --modes thread process --json loadtest_output.json
+
+Each session is a thread that submits a job, waits for its result, pauses
+for --think seconds and submits the next one, like a user of the app. Jobs
+run in one of three modes:
+
+    serial   one job at a time in the driver process (the baseline)
+    thread   the app's JobQueue (a thread pool shared by all sessions)
+    process  a process pool, one process_excel call per job
+
+Every session gets its own synthetic input (see bench.make_input_workbook),
+so the result cache is off unless --cache is given. Each mode runs in its
+own forked process, so the memory high-water marks do not carry over.
+Everything runs locally.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench import make_input_workbook
+from engine import (
+    DEFAULT_MAPPING_RULES,
+    JOB_WORKERS,
+    JobQueue,
+    ResultCache,
+    find_template_file,
+    peak_rss_mb,
+    process_excel,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODES = ("serial", "thread", "process")
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values (p in 0..100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def children_peak_rss_mb():
+    """Peak RSS of the largest finished child process in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage / 1024 if usage else None
+
+
+def _process_job(input_path, template_file, engine):
+    """Process-pool worker: run one job and return its output size."""
+    return len(process_excel(input_path, template_file, DEFAULT_MAPPING_RULES, engine=engine).getvalue())
+
+
+def drive(mode, inputs, template_file, requests, workers, engine="standard", think=0.0, cache=False):
+    """
+    Run len(inputs) concurrent sessions of `requests` jobs each and return the measurements.
+
+    Latency is measured per job from submission to result, so it includes
+    the time spent waiting for a worker.
+    """
+    result_cache = ResultCache() if cache else None
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    if mode == "serial":
+        # One job at a time, sessions served in turn
+        serial = threading.Lock()
+
+        def run(input_path):
+            with serial:
+                process_excel(input_path, template_file, DEFAULT_MAPPING_RULES, engine=engine, cache=result_cache)
+    elif mode == "thread":
+        queue = JobQueue(workers=workers, max_pending=len(inputs))
+
+        def run(input_path):
+            job = queue.submit(process_excel, input_path, template_file, DEFAULT_MAPPING_RULES,
+                               engine=engine, cache=result_cache)
+            job.wait()
+            if job.status != "done":
+                raise RuntimeError(job.error or job.status)
+    elif mode == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+        def run(input_path):
+            pool.submit(_process_job, input_path, template_file, engine).result()
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    def session(input_path):
+        for _ in range(requests):
+            start = time.perf_counter()
+            try:
+                run(input_path)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            if think:
+                time.sleep(think)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(path,)) for path in inputs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    if mode == "thread":
+        queue.shutdown()
+    elif mode == "process":
+        pool.shutdown()
+
+    return {
+        "mode": mode,
+        "workers": 1 if mode == "serial" else workers,
+        "sessions": len(inputs),
+        "requests": len(latencies),
+        "failures": failures,
+        "wall": wall,
+        "throughput": len(latencies) / wall if wall else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb(),
+        "worker_peak_rss_mb": children_peak_rss_mb() if mode == "process" else None,
+    }
+
+
+def _drive_case(conn, *args, **kwargs):
+    conn.send(drive(*args, **kwargs))
+    conn.close()
+
+
+def run_mode(*args, **kwargs):
+    """Run drive() in a forked child so its memory high-water mark is its own."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_drive_case, args=(child, *args), kwargs=kwargs)
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def _mb(value):
+    return f"{value:.0f}MB" if value is not None else "-"
+
+
+def _seconds(value):
+    return f"{value:.3f}s" if value is not None else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test process_excel with concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions")
+    parser.add_argument("--requests", type=int, default=3, help="Jobs per session")
+    parser.add_argument("--sheets", type=int, nargs="+", default=[10], help="Sheets per input workbook")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, nargs="+", default=[JOB_WORKERS],
+                        help="Pool sizes for the thread and process modes")
+    parser.add_argument("--engine", choices=["standard", "streaming"], default="standard")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds a session waits between jobs")
+    parser.add_argument("--cache", action="store_true", help="Share a ResultCache between sessions")
+    parser.add_argument("--template", help="Template workbook (default: template found in the current directory)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    template_file = args.template or find_template_file()
+    if not template_file:
+        parser.error("No template file found. Pass one with --template.")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for sheet_count in args.sheets:
+            inputs = [make_input_workbook(os.path.join(tmp, f"input_{sheet_count}_{n}.xlsx"), sheet_count, seed=n)
+                      for n in range(args.sessions)]
+            for mode in args.modes:
+                for workers in ([1] if mode == "serial" else args.workers):
+                    result = run_mode(mode, inputs, template_file, args.requests, workers,
+                                      engine=args.engine, think=args.think, cache=args.cache)
+                    result["sheets"] = sheet_count
+                    results.append(result)
+                    print(f"{sheet_count:>5} sheets  {mode:<7} workers={result['workers']:<2} "
+                          f"sessions={result['sessions']:<3} {result['throughput']:.2f} jobs/s  "
+                          f"p50={_seconds(result['p50'])} p95={_seconds(result['p95'])} p99={_seconds(result['p99'])}  "
+                          f"peak={_mb(result['peak_rss_mb'])} workers_peak={_mb(result['worker_peak_rss_mb'])}"
+                          + (f"  {len(result['failures'])} failed" if result["failures"] else ""))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import openpyxl
+from batch import find_input_files, main, process_batch
+
+# Create dummy inputs
+shutil.rmtree("dummy_batch", ignore_errors=True)
+os.makedirs("dummy_batch")
+for n in range(1, 4):
+    wb_input = openpyxl.Workbook()
+    ws1 = wb_input.active
+    ws1["I8"] = f"Service_{n}"
+    ws2 = wb_input.create_sheet("Sheet2")
+    ws2["I8"] = f"Service_{n}b"
+    wb_input.save(f"dummy_batch/input_{n}.xlsx")
+with open("dummy_batch/broken.xlsx", "w") as f:
+    f.write("not a workbook")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+wb_template.save("dummy_template_batch.xlsx")
+
+MAPPING_RULES = {"Service of Unit": ["I8"]}
+
+inputs = find_input_files(["dummy_batch"])
+print(f"Inputs: {inputs}")
+assert [os.path.basename(f) for f in inputs] == ["broken.xlsx", "input_1.xlsx", "input_2.xlsx", "input_3.xlsx"]
+
+# One output per input
+reports = process_batch(inputs, "dummy_template_batch.xlsx", MAPPING_RULES, output_dir="dummy_batch/out")
+for report in reports:
+    print(report)
+assert reports[0]["error"] and reports[0]["output"] is None
+assert all(r["error"] is None and r["sheets"] == 2 for r in reports[1:])
+ws_out = openpyxl.load_workbook("dummy_batch/out/input_2_processed.xlsx").active
+print(f"input_2 C2/D2: {ws_out['C2'].value} / {ws_out['D2'].value}") # Service_2 / Service_2b
+assert (ws_out["C2"].value, ws_out["D2"].value, ws_out["E2"].value) == ("Service_2", "Service_2b", None)
+
+# Combined output
+reports = process_batch(inputs[1:], "dummy_template_batch.xlsx", MAPPING_RULES, combined="dummy_batch/combined.xlsx")
+ws_out = openpyxl.load_workbook("dummy_batch/combined.xlsx").active
+print(f"Combined row 1: {[c.value for c in ws_out[1]]}") # None, None, 1..6
+print(f"Combined row 2: {[c.value for c in ws_out[2]]}")
+assert [c.value for c in ws_out[1]][2:] == [1, 2, 3, 4, 5, 6]
+assert ws_out["G2"].value == "Service_3"
+
+# CLI
+exit_code = main(["dummy_batch/input_*.xlsx", "--template", "dummy_template_batch.xlsx", "--out-dir", "dummy_batch/cli", "--engine", "streaming"])
+assert exit_code == 0
+assert sorted(os.listdir("dummy_batch/cli")) == ["input_1_processed.xlsx", "input_2_processed.xlsx", "input_3_processed.xlsx"]
+
+# Inputs with the same name in different directories do not overwrite each other
+os.makedirs("dummy_batch/other")
+shutil.copy("dummy_batch/input_3.xlsx", "dummy_batch/other/input_1.xlsx")
+reports = process_batch(["dummy_batch/input_1.xlsx", "dummy_batch/other/input_1.xlsx"], "dummy_template_batch.xlsx",
+                        MAPPING_RULES, output_dir="dummy_batch/same")
+assert [os.path.basename(r["output"]) for r in reports] == ["input_1_processed.xlsx", "input_1_2_processed.xlsx"]
+assert openpyxl.load_workbook("dummy_batch/same/input_1_2_processed.xlsx").active["C2"].value == "Service_3"
@@ -0,0 +1,118 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import openpyxl
+from engine import Checkpoint, JobStats, ResultCache, job_key, process_excel
+
+# Create dummy input with 7 sheets
+wb_input = openpyxl.Workbook()
+wb_input.remove(wb_input.active)
+for i in range(7):
+    ws = wb_input.create_sheet(f"E-{101 + i}")
+    ws["I8"] = f"Service_{i + 1}"
+    ws["T20"] = 100 + i
+wb_input.save("dummy_input_chunked.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+wb_template.save("dummy_template_chunked.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+ARGS = ("dummy_input_chunked.xlsx", "dummy_template_chunked.xlsx", MAPPING_RULES)
+shutil.rmtree("dummy_checkpoints", ignore_errors=True)
+
+def columns(output):
+    ws = openpyxl.load_workbook(output).active
+    return [[ws.cell(row=r, column=c).value for r in range(1, 5)] for c in range(3, ws.max_column + 1)]
+
+expected = columns(process_excel(*ARGS))
+
+# Progress is reported per chunk; the output matches the regular pipeline
+for writer in ("openpyxl", "fast"):
+    events = []
+    stats = JobStats(on_event=lambda event, payload: events.append((event, payload)))
+    output = process_excel(*ARGS, writer=writer, chunk_size=3, stats=stats)
+    assert columns(output) == expected
+    assert [p["sheets_done"] for e, p in events if e == "chunk"] == [3, 6, 7]
+    assert len(stats.sheets) == 7
+
+# A run cancelled in the second chunk keeps the first one
+class Cancelled(Exception):
+    pass
+
+def cancel_at(sheet):
+    def on_event(event, payload):
+        if event == "sheet" and payload["sheet"] == sheet:
+            raise Cancelled()
+    return on_event
+
+checkpoint = Checkpoint.for_job("dummy_checkpoints", job_key(*ARGS))
+try:
+    process_excel(*ARGS, chunk_size=3, checkpoint_dir="dummy_checkpoints", stats=JobStats(on_event=cancel_at(4)))
+    raise AssertionError("the run should have been cancelled")
+except Cancelled:
+    pass
+assert checkpoint.count() == 3
+
+# A torn write is dropped on load
+with open(checkpoint.path, "ab") as f:
+    f.write(b"\x80\x05\x95garbage")
+assert checkpoint.count() == 3
+
+# Resuming reads only the remaining sheets
+stats = JobStats()
+output = process_excel(*ARGS, chunk_size=3, checkpoint_dir="dummy_checkpoints", stats=stats)
+print(f"Resumed after {stats.resumed_sheets} sheets, read {[s['sheet'] for s in stats.sheets]}")
+assert stats.resumed_sheets == 3
+assert [s["sheet"] for s in stats.sheets] == [3, 4, 5, 6]
+assert columns(output) == expected
+assert not os.path.exists(checkpoint.path)  # Removed once the output is written
+
+# Cached outputs are shared with the regular pipeline
+cache = ResultCache()
+process_excel(*ARGS, cache=cache)
+stats = JobStats()
+assert columns(process_excel(*ARGS, cache=cache, chunk_size=3, stats=stats)) == expected
+assert stats.cache == "hit"
+
+# Concurrent runs of the same job take turns on its checkpoint
+for shared_cache in (None, ResultCache()):
+    outputs = [None, None]
+    def run(slot):
+        outputs[slot] = process_excel(*ARGS, cache=shared_cache, chunk_size=2, checkpoint_dir="dummy_checkpoints")
+    threads = [threading.Thread(target=run, args=(slot,)) for slot in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [columns(output) for output in outputs] == [expected, expected]
+    if shared_cache is not None:
+        stats = JobStats()
+        assert columns(process_excel(*ARGS, cache=shared_cache, stats=stats)) == expected
+        assert stats.cache == "hit"
+assert not os.path.exists(checkpoint.path)
+assert not os.listdir("dummy_checkpoints")  # Lock files go with the checkpoint
+assert not Checkpoint._locks
+
+try:
+    process_excel(*ARGS, layout="sheets", chunk_size=3)
+    raise AssertionError("chunked sheets layout should be rejected")
+except ValueError as e:
+    print(e)
+
+# Command line
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_chunked.xlsx", "--template", "dummy_template_chunked.xlsx",
+     "--chunk-size", "2", "--checkpoint-dir", "dummy_checkpoints", "-o", "dummy_output_chunked.xlsx"],
+    capture_output=True, text=True
+)
+assert result.returncode == 0, result.stderr
+assert len(columns("dummy_output_chunked.xlsx")) == 7
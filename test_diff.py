@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import openpyxl
+from engine import JobStats, compare_revisions, diff_matrix
+
+def save_revision(path, sheets):
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for title, cells in sheets:
+        ws = wb.create_sheet(title)
+        for addr, value in cells.items():
+            ws[addr] = value
+    wb.save(path)
+
+# Rev B reorders and renames sheets, changes one value and adds an item; rev C drops E-101
+save_revision("dummy_rev_a.xlsx", [
+    ("Sheet1", {"AV8": "E-101", "I8": "Cooler", "T20": 100}),
+    ("Sheet2", {"AV8": "E-102", "I8": "Heater", "T20": 40}),
+])
+save_revision("dummy_rev_b.xlsx", [
+    ("E-102", {"AV8": "E-102", "I8": "Heater", "T20": 45}),
+    ("E-101", {"AV8": " E-101 ", "I8": "Cooler", "T20": 100}),
+    ("E-103", {"AV8": "E-103", "I8": "Reboiler"}),
+    ("Copy", {"AV8": "E-103", "I8": "Reboiler (old)"}),
+])
+save_revision("dummy_rev_c.xlsx", [
+    ("Sheet1", {"AV8": "E-102", "I8": "Heater", "T20": 45}),
+    ("Notes", {}),
+])
+
+MAPPING_RULES = {
+    "Item No.": ["AV8"],
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+REVISIONS = ["dummy_rev_a.xlsx", "dummy_rev_b.xlsx", "dummy_rev_c.xlsx"]
+
+stats = JobStats()
+report = compare_revisions(REVISIONS, MAPPING_RULES, stats=stats)
+print(report[report["Changed"]].to_string())
+assert list(report.columns) == ["Item No.", "Label"] + REVISIONS + ["Changed"]
+
+# Sheets are aligned by Item No.; empty ones fall back to the sheet name
+assert list(report["Item No."].unique()) == ["E-101", "E-102", "E-103", "Notes"]
+row = report[(report["Item No."] == "E-102") & (report["Label"] == "Temperature (In/Out) In")].iloc[0]
+assert [row[name] for name in REVISIONS] == ["40", "45", "45"] and row["Changed"]
+row = report[(report["Item No."] == "E-101") & (report["Label"] == "Service of Unit")].iloc[0]
+assert [row[name] for name in REVISIONS] == ["Cooler", "Cooler", None] and row["Changed"]
+assert stats.warnings == ["dummy_rev_b.xlsx: duplicate Item No. 'E-103' in sheet 'Copy' ignored"]
+
+matrix = diff_matrix(report)
+print(matrix)
+assert list(matrix.columns) == ["Item No.", "Service of Unit", "Temperature (In/Out) In", "Temperature (In/Out) Out"]
+assert matrix.loc["E-102"].tolist() == [False, False, True, False]
+assert matrix.loc["E-101"].all() and matrix.loc["E-103"].all()
+
+# Streamed by default, with the same report as the standard engine
+assert compare_revisions(REVISIONS, MAPPING_RULES, engine="standard").equals(report)
+
+# Two unchanged revisions have no changes
+assert not compare_revisions(["dummy_rev_a.xlsx", "dummy_rev_a.xlsx"], MAPPING_RULES, names=["A", "A2"])["Changed"].any()
+
+for bad in (lambda: compare_revisions(REVISIONS[:1], MAPPING_RULES),
+            lambda: compare_revisions(REVISIONS, {"Service of Unit": ["I8"]})):
+    try:
+        bad()
+        raise AssertionError("compare_revisions should reject this")
+    except ValueError as e:
+        print(e)
+
+# Command line
+result = subprocess.run(
+    [sys.executable, "-m", "engine", *REVISIONS[:2], "--diff", "-o", "dummy_diff.csv"],
+    capture_output=True, text=True
+)
+assert result.returncode == 0, result.stderr
+print(result.stdout.strip())
+assert result.stdout.startswith("2 of 3 items changed")
+with open("dummy_diff.csv", encoding="utf-8") as f:
+    assert f.readline().strip() == "Item No.,Label,dummy_rev_a.xlsx,dummy_rev_b.xlsx,Changed"
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+import openpyxl
+
+# Importing the engine must not pull in Streamlit or pandas
+check = "import sys, engine; print(sorted(m for m in ('streamlit', 'pandas') if m in sys.modules))"
+loaded = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout.strip()
+print(f"Heavy modules after import: {loaded}")
+assert loaded == "[]"
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "E-101"
+ws1["I8"] = "Service_1"
+ws1["T20"] = 100.5
+ws1["AF20"] = 60
+wb_input.save("dummy_input_cli.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+wb_template.save("dummy_template_cli.xlsx")
+
+with open("dummy_rules_cli.json", "w", encoding="utf-8") as f:
+    json.dump({
+        "Service of Unit": ["I8"],
+        "Temperature (In/Out)": [{"action": "vertical", "cells": ["T20", "AF20"]}],
+    }, f)
+
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_cli.xlsx",
+     "--template", "dummy_template_cli.xlsx", "--rules", "dummy_rules_cli.json",
+     "-o", "dummy_output_cli.xlsx", "--stats", "dummy_stats_cli.json"],
+    capture_output=True, text=True
+)
+print(result.stdout.strip())
+assert result.returncode == 0, result.stderr
+
+ws_out = openpyxl.load_workbook("dummy_output_cli.xlsx").active
+print(f"Service: {ws_out['C2'].value}, Temp: {ws_out['C3'].value}/{ws_out['C4'].value}")
+assert ws_out["C2"].value == "Service_1"
+assert ws_out["C3"].value == "100.5"
+assert ws_out["C4"].value == "60"
+
+with open("dummy_stats_cli.json", encoding="utf-8") as f:
+    job = json.load(f)
+assert len(job["sheets"]) == 1
+assert job["cells_written"] == 4  # Header + 3 rows
+
+# Table output needs no template
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_cli.xlsx", "--rules", "dummy_rules_cli.json",
+     "--table", "csv", "-o", "dummy_table_cli.csv"],
+    capture_output=True, text=True
+)
+assert result.returncode == 0, result.stderr
+with open("dummy_table_cli.csv", encoding="utf-8") as f:
+    header = f.readline().strip()
+print(f"Table header: {header}")
+assert header == "Sheet,Service of Unit,Temperature (In/Out) In,Temperature (In/Out) Out"
@@ -0,0 +1,61 @@
+import zipfile
+import openpyxl
+from io import BytesIO
+from engine import patch_xlsx, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service & <Unit> 1"
+ws1["T20"] = "100"
+ws1["AF20"] = "60"
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "  Service_2"
+wb_input.save("dummy_input_fast.xlsx")
+
+# Create dummy template (styled label column, second sheet active)
+wb_template = openpyxl.Workbook()
+ws_cover = wb_template.active
+ws_cover.title = "Cover"
+ws_cover["A1"] = "Cover page"
+ws_temp = wb_template.create_sheet("Template")
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+ws_temp["A10"] = "Footer"
+ws_temp["C2"].font = openpyxl.styles.Font(bold=True)
+ws_temp.merge_cells("A12:B12")
+wb_template.active = 1
+wb_template.save("dummy_template_fast.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+def read_output(result):
+    wb_out = openpyxl.load_workbook(result)
+    ws_out = wb_out.active
+    return ws_out.title, [[(c.value or None, c.font.b) for c in row] for row in ws_out.iter_rows()], wb_out["Cover"]["A1"].value
+
+standard = process_excel("dummy_input_fast.xlsx", "dummy_template_fast.xlsx", MAPPING_RULES)
+fast = process_excel("dummy_input_fast.xlsx", "dummy_template_fast.xlsx", MAPPING_RULES, writer="fast")
+
+# Verify output
+print(f"Fast output: {read_output(fast)}")
+assert read_output(fast) == read_output(BytesIO(standard.getvalue()))
+ws_out = openpyxl.load_workbook(fast).active
+assert ws_out["C2"].value == "Service & <Unit> 1" and ws_out["C2"].font.b
+assert ws_out["D2"].value == "  Service_2"
+assert [str(r) for r in ws_out.merged_cells.ranges] == ["A12:B12"]
+
+# Every other package part is copied byte-for-byte
+template_zip = zipfile.ZipFile("dummy_template_fast.xlsx")
+fast_zip = zipfile.ZipFile(fast)
+changed = [n for n in template_zip.namelist() if template_zip.read(n) != fast_zip.read(n)]
+print(f"Changed parts: {changed}") # ['xl/worksheets/sheet2.xml']
+assert changed == ["xl/worksheets/sheet2.xml"]
+
+# Writing into an empty row range extends the dimension
+with open("dummy_template_fast.xlsx", "rb") as f:
+    patched = patch_xlsx(f.read(), {(20, 30): 1.5})
+assert openpyxl.load_workbook(patched).active["AD20"].value == 1.5
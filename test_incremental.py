@@ -0,0 +1,70 @@
+import openpyxl
+from io import BytesIO
+from engine import JobStats, ResultCache, diff_rules, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service_1"
+ws1["T20"] = "100"
+ws1["AF20"] = "60"
+ws1["AV8"] = "E-101"
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "Service_2"
+ws2["T20"] = "110"
+ws2["AF20"] = "70"
+ws2["AV8"] = "E-102"
+input_bytes = BytesIO()
+wb_input.save(input_bytes)
+input_bytes = input_bytes.getvalue()
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+ws_temp["A4"] = "Item No."  # Overlaps the Vertical spill of row 3
+wb_template.save("dummy_template_inc.xlsx")
+
+RULES_1 = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": ["T20"],
+    "Item No.": ["AV8"],
+}
+RULES_2 = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+RULES_3 = {
+    "Service of Unit": ["AV8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+    "Item No.": ["AV8"],
+}
+
+print(f"Changed labels: {sorted(diff_rules(RULES_1, RULES_2))}") # ['Item No.', 'Temperature (In/Out)']
+assert diff_rules(RULES_1, RULES_2) == {"Temperature (In/Out)", "Item No."}
+assert diff_rules(RULES_1, dict(RULES_1)) == set()
+
+def read_output(result):
+    ws_out = openpyxl.load_workbook(result).active
+    return [[c.value for c in row] for row in ws_out.iter_rows(min_row=1, max_row=4, max_col=4)]
+
+cache = ResultCache()
+for rules in (RULES_1, RULES_2, RULES_3, RULES_1):
+    incremental = read_output(process_excel(BytesIO(input_bytes), "dummy_template_inc.xlsx", rules, cache=cache))
+    full = read_output(process_excel(BytesIO(input_bytes), "dummy_template_inc.xlsx", rules))
+    print(f"Incremental: {incremental}")
+    assert incremental == full
+
+# RULES_1 again: Item No. is back in row 4 after the Vertical spill went away
+assert incremental[3][2:] == ["E-101", "E-102"]
+
+# Filled workbooks count against their own byte budget, by saved size
+for budget, expected in ((1024 * 1024, "refill"), (1, "miss")):
+    cache = ResultCache(max_filled_bytes=budget)
+    for rules in (RULES_1, RULES_2):
+        stats = JobStats()
+        process_excel(BytesIO(input_bytes), "dummy_template_inc.xlsx", rules, cache=cache, stats=stats)
+    print(f"Budget {budget}: {stats.cache}, {cache._filled_bytes} bytes kept")
+    assert stats.cache == expected
+    assert 0 < cache._filled_bytes <= budget if expected == "refill" else cache._filled_bytes == 0
@@ -0,0 +1,82 @@
+import threading
+import time
+import openpyxl
+from engine import JobQueue, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "Sheet1"
+ws1["I8"] = "Service_1"
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "Service_2"
+wb_input.save("dummy_input_jobs.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+wb_template.save("dummy_template_jobs.xlsx")
+
+MAPPING_RULES = {"Service of Unit": ["I8"]}
+
+def wait(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.finished:
+        assert time.time() < deadline, f"job {job.id} did not finish"
+        time.sleep(0.01)
+
+queue = JobQueue(workers=1, max_pending=2, history=3)
+
+# A finished job keeps its result and progress
+job = queue.submit(process_excel, "dummy_input_jobs.xlsx", "dummy_template_jobs.xlsx", MAPPING_RULES,
+                   name="dummy_input_jobs.xlsx", total_sheets=2)
+assert job.wait(30)
+print(f"Job {job.id}: {job.status}, {job.sheets_done}/{job.total_sheets} sheets")
+assert job.status == "done"
+assert job.sheets_done == 2 and job.progress == 1.0
+assert queue.get(job.id) is job
+ws_out = openpyxl.load_workbook(job.result).active
+assert [ws_out["C2"].value, ws_out["D2"].value] == ["Service_1", "Service_2"]
+assert len(job.stats["sheets"]) == 2
+
+# Errors are recorded on the job instead of raised
+failed = queue.submit(process_excel, "dummy_missing_jobs.xlsx", "dummy_template_jobs.xlsx", MAPPING_RULES)
+wait(failed)
+print(f"Failed job: {failed.error}")
+assert failed.status == "failed" and failed.error
+
+# Block the only worker, then fill the queue
+release = threading.Event()
+def blocking(stats=None):
+    release.wait(10)
+    with stats.phase("work"):
+        pass
+    return "finished"
+
+running = queue.submit(blocking)
+while running.status != "running":
+    time.sleep(0.01)
+queued = [queue.submit(blocking) for _ in range(2)]
+try:
+    queue.submit(blocking)
+    raise AssertionError("queue should be full")
+except RuntimeError as e:
+    print(f"Queue full: {e}")
+
+# Cancelling a queued job means it never runs; a running one stops at its next phase
+assert queue.cancel(queued[0].id)
+assert queued[0].status == "cancelled"
+assert queue.cancel(running.id)
+release.set()
+wait(running)
+wait(queued[1])
+print(f"Statuses: {running.status}, {queued[0].status}, {queued[1].status}")
+assert running.status == "cancelled" and running.result is None
+assert queued[1].status == "done" and queued[1].result == "finished"
+assert not queue.cancel(queued[1].id)
+
+# Only the last `history` finished jobs are kept
+assert queue.get(job.id) is None
+assert len(queue.jobs()) == 3
+queue.shutdown()
@@ -62,7 +62,7 @@ def process_excel_test(input_file, template_file):
         template_sheet.cell(row=1, column=target_col_idx).value = i + 1
         duplicate_counters = {key: 0 for key in MAPPING_RULES}
         
-        for row_idx in range(2, 10):
+        for row_idx in range(2, template_sheet.max_row + 1):
             label_cell = template_sheet.cell(row=row_idx, column=1)
             label = label_cell.value
             if label:
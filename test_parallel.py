@@ -0,0 +1,56 @@
+import openpyxl
+from io import BytesIO
+from engine import process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+wb_input.remove(wb_input.active)
+for n in range(1, 8):
+    ws = wb_input.create_sheet(f"Sheet{n}")
+    ws["I8"] = f"Service_{n}"
+    ws["T20"] = n * 10
+    ws["AF20"] = n * 10 + 5
+input_bytes = BytesIO()
+wb_input.save(input_bytes)
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp.title = "Template"
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+wb_template.save("dummy_template_parallel.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+def read_output(result):
+    ws_out = openpyxl.load_workbook(result).active
+    return [[c.value for c in row] for row in ws_out.iter_rows()]
+
+serial = read_output(process_excel(BytesIO(input_bytes.getvalue()), "dummy_template_parallel.xlsx", MAPPING_RULES))
+parallel = read_output(process_excel(BytesIO(input_bytes.getvalue()), "dummy_template_parallel.xlsx", MAPPING_RULES, workers=3))
+
+# Verify output
+print(f"Parallel header: {parallel[0]}") # [None, None, 1, 2, 3, 4, 5, 6, 7]
+print(f"Parallel service: {parallel[1]}") # Service_1 ... Service_7
+assert parallel == serial
+assert parallel[0][2:] == [1, 2, 3, 4, 5, 6, 7]
+assert parallel[1][2:] == [f"Service_{n}" for n in range(1, 8)]
+assert parallel[3][8] == "75"
+
+# A chartsheet reads as a blank column, and does not stop the workers
+from openpyxl.chart import BarChart, Reference
+chart = BarChart()
+chart.add_data(Reference(wb_input["Sheet1"], min_col=20, min_row=20, max_row=20))
+wb_input.create_chartsheet("Chart", 3).add_chart(chart)
+chart_bytes = BytesIO()
+wb_input.save(chart_bytes)
+
+serial = read_output(process_excel(BytesIO(chart_bytes.getvalue()), "dummy_template_parallel.xlsx", MAPPING_RULES))
+parallel = read_output(process_excel(BytesIO(chart_bytes.getvalue()), "dummy_template_parallel.xlsx", MAPPING_RULES, workers=3))
+print(f"Parallel service with a chartsheet: {parallel[1]}")
+assert parallel == serial
+assert parallel[1][2:] == ["Service_1", "Service_2", "Service_3", None, "Service_4", "Service_5", "Service_6", "Service_7"]
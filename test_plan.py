@@ -0,0 +1,77 @@
+import openpyxl
+from engine import compile_mapping_plan, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "Sheet1"
+ws1["I8"] = "Service_1"
+ws1["E9"] = "500"
+ws1["N9"] = "3000"
+ws1["T20"] = "100"
+ws1["AF20"] = "60"
+
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "Service_2"
+ws2["T20"] = "110"
+ws2["AF20"] = "70"
+wb_input.save("dummy_input_plan.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp.title = "Template"
+ws_temp["A2"] = "Service of Unit "
+ws_temp["A3"] = "Size"
+ws_temp["A4"] = "Temperature (In/Out)"
+# A5 is empty (Vertical spill)
+ws_temp["A6"] = "Unknown Label"
+wb_template.save("dummy_template_plan.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Size": [ ["E9", "M9", "N9"] ],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+# Compile plan
+plan = compile_mapping_plan(ws_temp, MAPPING_RULES)
+print(f"Plan: {plan}")
+assert plan == (
+    ("Service of Unit", ((2, ("I8",)),)),
+    ("Size", ((3, ("E9", "M9", "N9")),)),
+    ("Temperature (In/Out)", ((4, ("T20",)), (5, ("AF20",)))),
+)
+# Same template and rules reuse the compiled plan
+assert compile_mapping_plan(ws_temp, dict(MAPPING_RULES)) is plan
+
+# Run real logic
+result = process_excel("dummy_input_plan.xlsx", "dummy_template_plan.xlsx", MAPPING_RULES)
+
+# Verify output
+ws_out = openpyxl.load_workbook(result).active
+print(f"Service: {ws_out['C2'].value}") # Service_1
+print(f"Size: {ws_out['C3'].value}") # 500 3000
+print(f"Temp In/Out: {ws_out['C4'].value} / {ws_out['C5'].value}") # 100 / 60
+print(f"Col D (Sheet2) Temp In/Out: {ws_out['D4'].value} / {ws_out['D5'].value}") # 110 / 70
+assert ws_out["C1"].value == 1 and ws_out["D1"].value == 2
+assert ws_out["C2"].value == "Service_1"
+assert ws_out["C3"].value == "500 3000"
+assert (ws_out["C4"].value, ws_out["C5"].value) == ("100", "60")
+assert (ws_out["D4"].value, ws_out["D5"].value) == ("110", "70")
+assert ws_out["D3"].value is None
+
+# Labels are read down to the last used row, not only rows 2-149
+ws_temp["A200"] = "Fluid Name"
+ws_temp["A230"] = "Fluid Name"
+ws_temp["A231"] = "Fluid Name"
+rules = {**MAPPING_RULES, "Fluid Name": ["T13", "AR13"], "Item No.": ["AV8"]}
+warnings = []
+long_plan = compile_mapping_plan(ws_temp, rules, warnings)
+assert long_plan[-2:] == (("Fluid Name", ((200, ("T13",)),)), ("Fluid Name", ((230, ("AR13",)),)))
+print(f"Warnings: {warnings}")
+assert warnings == [
+    "Template label 'Unknown Label' (row 6) has no mapping rule",
+    "Template label 'Fluid Name' has more rows than rules; row(s) 231 stay empty",
+    "Rule 'Item No.' matches no template label",
+]
@@ -0,0 +1,80 @@
+import json
+import subprocess
+import sys
+import openpyxl
+from engine import TemplateRegistry, load_registry, process_layouts
+
+# Create a mixed-layout input: two vendors put the same data in different cells
+wb_input = openpyxl.Workbook()
+ws = wb_input.active
+ws.title = "A-1"
+ws["A1"] = "Vendor A Datasheet"
+ws["I8"] = "Service_A1"
+ws = wb_input.create_sheet("B-1")
+ws["A1"] = "VENDOR B"
+ws["B2"] = "rev 3"
+ws["C5"] = "Service_B1"
+ws = wb_input.create_sheet("A-2")
+ws["A1"] = "  vendor a   datasheet "  # Anchors ignore case and spacing
+ws["I8"] = "Service_A2"
+ws = wb_input.create_sheet("Notes")
+ws["A1"] = "Cover page"
+wb_input.save("dummy_input_registry.xlsx")
+
+# One template per layout
+for name, label in (("a", "Service of Unit"), ("b", "Service")):
+    wb_template = openpyxl.Workbook()
+    wb_template.active["A2"] = label
+    wb_template.save(f"dummy_template_registry_{name}.xlsx")
+
+registry = TemplateRegistry()
+registry.register("vendor_a", "dummy_template_registry_a.xlsx", {"Service of Unit": ["I8"]},
+                  {"A1": "Vendor A Datasheet"})
+registry.register("vendor_b", "dummy_template_registry_b.xlsx", {"Service": ["C5"]},
+                  {"A1": "Vendor B", "B2": "Rev 3"})
+
+def read_outputs(outputs):
+    return {name: [[c.value for c in row] for row in openpyxl.load_workbook(output).active.iter_rows()]
+            for name, output in outputs.items()}
+
+outputs, unmatched = process_layouts("dummy_input_registry.xlsx", registry)
+results = read_outputs(outputs)
+print(results, unmatched)
+assert results["vendor_a"] == [[None, None, 1, 2], ["Service of Unit", None, "Service_A1", "Service_A2"]]
+assert results["vendor_b"] == [[None, None, 1], ["Service", None, "Service_B1"]]
+assert unmatched == ["Notes"]
+
+# Same result with the other engines and writers
+for kwargs in ({"engine": "streaming"}, {"workers": 2}, {"writer": "fast"}):
+    other, other_unmatched = process_layouts("dummy_input_registry.xlsx", registry, **kwargs)
+    assert read_outputs(other) == results and other_unmatched == unmatched, kwargs
+
+# A layout without anchors takes the sheets nothing else matched
+registry.register("fallback", "dummy_template_registry_a.xlsx", {"Service of Unit": ["I8"]})
+outputs, unmatched = process_layouts("dummy_input_registry.xlsx", registry)
+assert unmatched == [] and sorted(outputs) == ["fallback", "vendor_a", "vendor_b"]
+
+# Two layouts with the same anchors are rejected
+try:
+    registry.register("vendor_a_copy", "dummy_template_registry_a.xlsx", None, {"A1": "vendor a datasheet"})
+    raise AssertionError("duplicate anchors should be rejected")
+except ValueError as e:
+    print(e)
+
+# Manifest + CLI
+with open("dummy_registry.json", "w", encoding="utf-8") as f:
+    json.dump({"layouts": [
+        {"name": "vendor_a", "template": "dummy_template_registry_a.xlsx",
+         "rules": {"Service of Unit": ["I8"]}, "anchors": {"A1": "Vendor A Datasheet"}},
+        {"name": "vendor_b", "template": "dummy_template_registry_b.xlsx",
+         "rules": {"Service": ["C5"]}, "anchors": {"A1": "Vendor B", "B2": "Rev 3"}},
+    ]}, f)
+assert [layout.name for layout in load_registry("dummy_registry.json").layouts] == ["vendor_a", "vendor_b"]
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_registry.xlsx", "--registry", "dummy_registry.json",
+     "-o", "dummy_output_registry.xlsx"],
+    capture_output=True, text=True
+)
+print(result.stdout.strip())
+assert result.returncode == 0, result.stderr
+assert openpyxl.load_workbook("dummy_output_registry_vendor_b.xlsx").active["C2"].value == "Service_B1"
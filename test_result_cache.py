@@ -0,0 +1,59 @@
+import shutil
+import openpyxl
+from io import BytesIO
+import engine
+from engine import ResultCache, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service_1"
+ws1["AV8"] = "E-101"
+ws1["T13"] = "Water"
+input_bytes = BytesIO()
+wb_input.save(input_bytes)
+input_bytes = input_bytes.getvalue()
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Item No."
+wb_template.save("dummy_template_result.xlsx")
+
+# Count cell reads
+reads = []
+original_get_cell_value = engine.get_cell_value
+def counting_get_cell_value(sheet, addr):
+    reads.append(addr)
+    return original_get_cell_value(sheet, addr)
+engine.get_cell_value = counting_get_cell_value
+
+cache = ResultCache(max_bytes=1, spill_dir="dummy_result_spill")
+RULES_1 = {"Service of Unit": ["I8"], "Item No.": ["AV8"]}
+RULES_2 = {"Service of Unit": ["I8"], "Item No.": ["T13"]}
+
+first = process_excel(BytesIO(input_bytes), "dummy_template_result.xlsx", RULES_1, cache=cache).getvalue()
+print(f"First run reads: {reads}") # ['I8', 'AV8']
+assert reads == ["I8", "AV8"]
+
+# Identical upload returns the cached output without reading the input
+reads.clear()
+again = process_excel(BytesIO(input_bytes), "dummy_template_result.xlsx", RULES_1, cache=cache).getvalue()
+assert reads == [] and again == first
+
+# A rules change only re-reads the changed cells
+reads.clear()
+changed = process_excel(BytesIO(input_bytes), "dummy_template_result.xlsx", RULES_2, cache=cache)
+print(f"Changed rules reads: {reads}") # ['T13']
+assert reads == ["T13"]
+ws_out = openpyxl.load_workbook(changed).active
+assert (ws_out["C2"].value, ws_out["C3"].value) == ("Service_1", "Water")
+
+# The first output was spilled to disk (max_bytes=1) and is read back
+reads.clear()
+spilled = process_excel(BytesIO(input_bytes), "dummy_template_result.xlsx", RULES_1, cache=cache).getvalue()
+assert reads == [] and spilled == first
+
+engine.get_cell_value = original_get_cell_value
+shutil.rmtree("dummy_result_spill")
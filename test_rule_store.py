@@ -0,0 +1,97 @@
+import os
+import pickle
+import subprocess
+import sys
+import openpyxl
+from engine import JobStats, ResultCache, RuleStore, compile_mapping_plan, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service_1"
+ws1["T20"] = 100
+wb_input.save("dummy_input_store.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+ws_temp["A5"] = "Remarks"
+wb_template.save("dummy_template_store.xlsx")
+
+RULES_V1 = {"Service of Unit": ["I8"]}
+RULES_V2 = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [{"action": "vertical", "cells": ["T20", "AF20"]}],
+}
+
+if os.path.exists("dummy_rules_store.db"):
+    os.remove("dummy_rules_store.db")
+store = RuleStore("dummy_rules_store.db")
+assert store.latest() is None
+
+# Saving appends versions; saving unchanged rules does not
+v1 = store.save("E-Series", RULES_V1, note="first")
+assert store.save("E-Series", dict(RULES_V1)) is v1
+v2 = store.save("E-Series", RULES_V2)
+print(f"Saved {v1.label}, {v2.label}")
+assert (v1.version, v2.version) == (1, 2)
+assert v2 == RULES_V2
+assert store.names() == ["E-Series"]
+assert [v["version"] for v in store.versions("E-Series")] == [2, 1]
+assert store.versions("E-Series")[1]["note"] == "first"
+assert store.latest() is v2
+
+# Invalid rules and missing versions are rejected
+for bad in (lambda: store.save("E-Series", {"Size": ["9M"]}), lambda: store.save(" ", RULES_V1)):
+    try:
+        bad()
+        raise AssertionError("save should reject this")
+    except ValueError as e:
+        print(e)
+try:
+    store.load("E-Series", 3)
+    raise AssertionError("load should reject a missing version")
+except KeyError:
+    pass
+
+# Stored versions are read-only and pickle as plain dicts
+try:
+    v2["Remarks"] = ["A1"]
+    raise AssertionError("stored versions should be read-only")
+except TypeError:
+    pass
+assert type(pickle.loads(pickle.dumps(v2))) is dict
+
+# Compiled plans are stored with the version and reused by a fresh store
+warnings = []
+plan = compile_mapping_plan(ws_temp, v2, warnings)
+assert warnings == ["Template label 'Remarks' (row 5) has no mapping rule"]
+reopened = RuleStore("dummy_rules_store.db").load("E-Series")
+assert reopened is not v2 and len(reopened._plans) == 1
+warnings = []
+assert compile_mapping_plan(ws_temp, reopened, warnings) == plan
+assert warnings == ["Template label 'Remarks' (row 5) has no mapping rule"]
+assert compile_mapping_plan(ws_temp, RULES_V2) == plan
+
+# A stored version fills like the same dict and shares its cached result
+cache = ResultCache()
+expected = openpyxl.load_workbook(process_excel("dummy_input_store.xlsx", "dummy_template_store.xlsx", RULES_V2,
+                                                cache=cache)).active
+stats = JobStats()
+output = process_excel("dummy_input_store.xlsx", "dummy_template_store.xlsx", reopened, cache=cache, stats=stats)
+assert stats.cache == "hit"
+ws_out = openpyxl.load_workbook(output).active
+assert [ws_out.cell(row=r, column=3).value for r in range(1, 5)] == \
+       [expected.cell(row=r, column=3).value for r in range(1, 5)] == [1, "Service_1", "100", None]
+
+# Command line
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_store.xlsx", "--template", "dummy_template_store.xlsx",
+     "--rule-store", "dummy_rules_store.db", "--rule-set", "E-Series@1", "-o", "dummy_output_store.xlsx"],
+    capture_output=True, text=True
+)
+assert result.returncode == 0, result.stderr
+ws_out = openpyxl.load_workbook("dummy_output_store.xlsx").active
+assert (ws_out["C2"].value, ws_out["C3"].value) == ("Service_1", None)
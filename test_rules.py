@@ -0,0 +1,81 @@
+import json
+import pandas as pd
+from engine import DEFAULT_MAPPING_RULES, df_to_rules, load_rules, parse_address, rule_errors, rules_to_df, validate_rules
+
+# Addresses are parsed once into (row, column)
+assert parse_address("AV8") == (8, 48)
+assert parse_address("$B$3") == (3, 2)
+assert parse_address("i8") == (8, 9)
+assert parse_address("XFD1048576") == (1048576, 16384)
+for bad in ("NOT_A_CELL", "B0", "A1:B2", "XFE1", "", 8, None):
+    try:
+        parse_address(bad)
+        raise AssertionError(f"{bad!r} should be rejected")
+    except ValueError as e:
+        print(e)
+
+assert rule_errors(DEFAULT_MAPPING_RULES) == []
+assert validate_rules(DEFAULT_MAPPING_RULES) is DEFAULT_MAPPING_RULES
+
+# Every problem is reported at once
+problems = rule_errors({
+    "Size": [["E9", "M9X"]],
+    "Temp": [{"action": "vertical", "cells": ["T20", "AF20", "AR20"]}],
+    "Other": [{"action": "sum", "cells": ["A1"]}],
+    "Flat": "I8",
+})
+print(problems)
+assert problems == [
+    "Size (rule 1): 'M9X' is not a valid cell address",
+    "Temp (rule 1): a Vertical rule needs one or two cells (In, Out)",
+    "Other (rule 1): unknown action 'sum'",
+    "Flat: rules must be a list",
+]
+
+# Saving from the editor and loading JSON validate the rules
+df = pd.DataFrame([
+    {"Label": "Service of Unit", "Order": 1, "Type": "Single", "Cells": "I8"},
+    {"Label": "Size", "Order": 1, "Type": "Merge", "Cells": "E9, 9M"},
+])
+try:
+    df_to_rules(df)
+    raise AssertionError("df_to_rules should reject invalid addresses")
+except ValueError as e:
+    assert "Row 2 (Size): '9M' is not a valid cell address" in str(e)
+
+# The editor round-trips the rules and reports every bad row in one error
+editor = rules_to_df(DEFAULT_MAPPING_RULES)
+assert list(editor.columns) == ["Label", "Order", "Type", "Cells"]
+assert len(editor) == sum(len(rules) for rules in DEFAULT_MAPPING_RULES.values())
+assert df_to_rules(editor) == {label: DEFAULT_MAPPING_RULES[label] for label in sorted(DEFAULT_MAPPING_RULES)}
+editor.loc[0, "Type"] = "Sum"
+editor.loc[3, "Cells"] = "E9, M9X, 9N"
+editor.loc[5, "Label"] = None
+try:
+    df_to_rules(editor)
+    raise AssertionError("df_to_rules should reject the edited rows")
+except ValueError as e:
+    print(e)
+    lines = str(e).splitlines()[1:]
+    assert lines[0] == f"- Row 1 ({editor.loc[0, 'Label']}): type must be Single, Merge or Vertical"
+    assert lines[1:3] == [
+        f"- Row 4 ({editor.loc[3, 'Label']}): 'M9X' is not a valid cell address",
+        f"- Row 4 ({editor.loc[3, 'Label']}): '9N' is not a valid cell address",
+    ]
+    assert lines[3] == "- Row 6: missing label"
+
+# Frames are memoized; callers get their own copy
+first = rules_to_df(DEFAULT_MAPPING_RULES)
+first.loc[0, "Cells"] = "Z1"
+assert rules_to_df(DEFAULT_MAPPING_RULES).loc[0, "Cells"] == "I8"
+saved = df_to_rules(first)
+saved["Service of Unit"].append("Z2")
+assert df_to_rules(first)["Service of Unit"] == ["Z1"]
+
+with open("dummy_rules.json", "w", encoding="utf-8") as f:
+    json.dump({"Service of Unit": ["I8"], "Item No.": ["AV"]}, f)
+try:
+    load_rules("dummy_rules.json")
+    raise AssertionError("load_rules should reject invalid addresses")
+except ValueError as e:
+    assert "Item No. (rule 1)" in str(e)
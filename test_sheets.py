@@ -0,0 +1,101 @@
+import subprocess
+import sys
+import zipfile
+import openpyxl
+from openpyxl.styles import Font
+from openpyxl.workbook.defined_name import DefinedName
+from engine import JobStats, ResultCache, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "E-101"
+ws1["I8"] = "Service_1"
+ws1["T20"] = 100
+ws1["AF20"] = 60
+ws2 = wb_input.create_sheet("Notes")
+ws2["I8"] = "Service_2"
+ws3 = wb_input.create_sheet("E-103")
+ws3["I8"] = "Service_3"
+wb_input.save("dummy_input_sheets.xlsx")
+
+# Create dummy template with a style, a print area and a second sheet
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp.title = "Datasheet"
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A2"].font = Font(bold=True)
+ws_temp["A3"] = "Temperature (In/Out)"
+ws_temp["C2"].font = Font(italic=True)
+ws_temp.print_area = "A1:D10"
+wb_template.create_sheet("Notes")["A1"] = "Template notes"
+wb_template.save("dummy_template_sheets.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+stats = JobStats()
+output = process_excel("dummy_input_sheets.xlsx", "dummy_template_sheets.xlsx", MAPPING_RULES,
+                       stats=stats, layout="sheets")
+wb_out = openpyxl.load_workbook(output)
+
+# One sheet per input sheet, right where the template sheet was
+print(f"Output sheets: {wb_out.sheetnames}")
+assert wb_out.sheetnames == ["E-101", "Notes (2)", "E-103", "Notes"]
+assert wb_out["Notes"]["A1"].value == "Template notes"
+for number, (title, service) in enumerate((("E-101", "Service_1"), ("Notes (2)", "Service_2"), ("E-103", "Service_3")), 1):
+    ws = wb_out[title]
+    assert ws["A2"].value == "Service of Unit" and ws["A2"].font.bold
+    assert ws["C1"].value == number
+    assert ws["C2"].value == service and ws["C2"].font.italic
+    assert ws.print_area == f"'{title}'!$A$1:$D$10"
+    assert ws["D2"].value is None
+assert (wb_out["E-101"]["C3"].value, wb_out["E-101"]["C4"].value) == ("100", "60")
+assert stats.cells_written == 12  # Header + 3 rows on each sheet
+assert len(stats.sheets) == 3
+
+# At most one sheet is selected
+with zipfile.ZipFile(output) as package:
+    selected = [name for name in package.namelist()
+                if name.startswith("xl/worksheets/sheet") and b'tabSelected="1"' in package.read(name)]
+assert len(selected) <= 1
+
+# Same values as the column layout
+columns = openpyxl.load_workbook(process_excel("dummy_input_sheets.xlsx", "dummy_template_sheets.xlsx", MAPPING_RULES)).active
+for i, title in enumerate(["E-101", "Notes (2)", "E-103"]):
+    for row in range(1, 5):
+        assert wb_out[title].cell(row=row, column=3).value == columns.cell(row=row, column=3 + i).value
+
+# Cached separately from the column layout
+cache = ResultCache()
+for expected in ("miss", "hit"):
+    stats = JobStats()
+    cached = process_excel("dummy_input_sheets.xlsx", "dummy_template_sheets.xlsx", MAPPING_RULES,
+                           cache=cache, stats=stats, layout="sheets")
+    assert stats.cache == expected
+    assert openpyxl.load_workbook(cached).sheetnames == wb_out.sheetnames
+
+# Command line
+result = subprocess.run(
+    [sys.executable, "-m", "engine", "dummy_input_sheets.xlsx", "--template", "dummy_template_sheets.xlsx",
+     "--layout", "sheets", "-o", "dummy_output_sheets.xlsx"],
+    capture_output=True, text=True
+)
+assert result.returncode == 0, result.stderr
+assert openpyxl.load_workbook("dummy_output_sheets.xlsx").sheetnames[:3] == ["E-101", "Notes (2)", "E-103"]
+
+# Workbook-level names are pointed at the renamed template sheet, but not at sheets whose names end like it
+wb_template = openpyxl.load_workbook("dummy_template_sheets.xlsx")
+wb_template.create_sheet("MyDatasheet")
+wb_template.defined_names["Own"] = DefinedName("Own", attr_text="Datasheet!$A$1")
+wb_template.defined_names["Other"] = DefinedName("Other", attr_text="MyDatasheet!$A$1")
+wb_template.defined_names["Quoted"] = DefinedName("Quoted", attr_text="'MyDatasheet'!$A$1")
+wb_template.save("dummy_template_sheets_names.xlsx")
+wb_out = openpyxl.load_workbook(process_excel("dummy_input_sheets.xlsx", "dummy_template_sheets_names.xlsx",
+                                              MAPPING_RULES, layout="sheets"))
+print(f"Defined names: {[(n, d.attr_text) for n, d in wb_out.defined_names.items()]}")
+assert wb_out.defined_names["Own"].attr_text == "'E-101'!$A$1"
+assert wb_out.defined_names["Other"].attr_text == "MyDatasheet!$A$1"
+assert wb_out.defined_names["Quoted"].attr_text == "'MyDatasheet'!$A$1"
@@ -0,0 +1,61 @@
+import os
+import openpyxl
+from io import BytesIO
+import engine
+from engine import MappedFile, SpooledUpload, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service_1"
+ws1["T20"] = 100.5
+ws1["AF20"] = 60
+wb_input.create_sheet("Sheet2")["I8"] = "Service_2"
+wb_input.save("dummy_input_spool.xlsx")
+with open("dummy_input_spool.xlsx", "rb") as f:
+    input_bytes = f.read()
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+wb_template.save("dummy_template_spool.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [{"action": "vertical", "cells": ["T20", "AF20"]}],
+}
+
+def read_output(result):
+    ws_out = openpyxl.load_workbook(result).active
+    return [[c.value for c in row] for row in ws_out.iter_rows()]
+
+expected = read_output(process_excel(BytesIO(input_bytes), "dummy_template_spool.xlsx", MAPPING_RULES))
+
+# Small uploads stay in memory
+with SpooledUpload(BytesIO(input_bytes)) as upload:
+    assert upload.path is None and isinstance(upload.file, BytesIO)
+    assert read_output(process_excel(upload.file, "dummy_template_spool.xlsx", MAPPING_RULES)) == expected
+
+# Large uploads go to a temporary file that is read memory-mapped
+with SpooledUpload(BytesIO(input_bytes), max_size=1024, dir=".") as upload:
+    spooled_path = upload.path
+    print(f"Spooled to {spooled_path}")
+    assert os.path.getsize(spooled_path) == len(input_bytes)
+    for kwargs in ({}, {"engine": "streaming"}, {"workers": 2}, {"writer": "fast"}):
+        assert read_output(process_excel(upload.file, "dummy_template_spool.xlsx", MAPPING_RULES, **kwargs)) == expected, kwargs
+assert not os.path.exists(spooled_path)
+
+mapped = MappedFile("dummy_input_spool.xlsx")
+assert mapped.size == len(input_bytes)
+assert mapped.read(2) == b"PK" and mapped.tell() == 2
+assert openpyxl.load_workbook(mapped).sheetnames == ["Sheet", "Sheet2"]
+mapped.close()
+
+# Outputs past the threshold are spooled to disk but read back the same
+engine.SPOOL_OUTPUT_BYTES = 1024
+output = process_excel("dummy_input_spool.xlsx", "dummy_template_spool.xlsx", MAPPING_RULES)
+print(f"Output rolled to disk: {output._rolled}")
+assert output._rolled
+assert read_output(BytesIO(output.getvalue())) == expected
@@ -0,0 +1,57 @@
+import json
+import openpyxl
+from io import BytesIO
+from engine import JobStats, ResultCache, process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1["I8"] = "Service_1"
+ws1["T20"] = "100"
+ws1["AF20"] = "60"
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "Service_2"
+input_bytes = BytesIO()
+wb_input.save(input_bytes)
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Temperature (In/Out)"
+wb_template.save("dummy_template_stats.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+for kwargs in ({}, {"engine": "streaming", "writer": "fast"}, {"workers": 2}):
+    events = []
+    stats = JobStats(on_event=lambda event, payload: events.append(event))
+    process_excel(BytesIO(input_bytes.getvalue()), "dummy_template_stats.xlsx", MAPPING_RULES, stats=stats, **kwargs)
+    job = json.loads(stats.to_json())
+
+    # Verify stats
+    print(f"{kwargs}: phases={sorted(job['phases'])} read={job['cells_read']} written={job['cells_written']}")
+    assert set(job["phases"]) >= {"load_template", "compile", "read_input", "extract", "write", "save"}
+    assert job["input_bytes"] == len(input_bytes.getvalue())
+    assert [s["sheet"] for s in job["sheets"]] == [0, 1]
+    assert job["cells_read"] == 6  # I8, T20, AF20 on both sheets
+    assert job["cells_written"] == 8  # Header + 3 rows on both sheets
+    assert job["errors"] == []
+    assert events.count("sheet") == 2 and events[-1] == "done"
+
+# Extraction errors are kept per sheet and reported as events
+events = []
+stats = JobStats(on_event=lambda event, payload: events.append((event, payload)))
+stats.record_sheet(3, 0.0, 0.0, {("I8",): "x"}, [("Broken", "cannot read")])
+assert stats.errors == [{"sheet": 3, "label": "Broken", "error": "cannot read"}]
+assert [event for event, _ in events] == ["sheet", "error"]
+
+# Cache hits are reported
+cache = ResultCache()
+for expected in ("miss", "hit"):
+    stats = JobStats()
+    process_excel(BytesIO(input_bytes.getvalue()), "dummy_template_stats.xlsx", MAPPING_RULES, cache=cache, stats=stats)
+    assert stats.cache == expected
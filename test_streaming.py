@@ -0,0 +1,83 @@
+import openpyxl
+from engine import process_excel
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "Sheet1"
+ws1["I8"] = "Service_1"
+ws1["E9"] = 500
+ws1["M9"] = "x"
+ws1["N9"] = 3000
+ws1["T20"] = 100.5
+ws1["AF20"] = 60
+
+ws2 = wb_input.create_sheet("Sheet2")
+ws2["I8"] = "Service_2"
+ws2["BD20"] = "Out_2"  # Only cell in its row/column range
+wb_input.save("dummy_input_stream.xlsx")
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp.title = "Template"
+ws_temp["A2"] = "Service of Unit"
+ws_temp["A3"] = "Size"
+ws_temp["A4"] = "Temperature (In/Out)"
+ws_temp["A6"] = "Temperature (In/Out)"
+ws_temp["A8"] = "Broken"
+wb_template.save("dummy_template_stream.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Size": [ ["E9", "M9", "N9"] ],
+    "Temperature (In/Out)": [
+        {"action": "vertical", "cells": ["T20", "AF20"]},
+        {"action": "vertical", "cells": ["AR20", "BD20"]}
+    ],
+}
+
+def read_output(result):
+    ws_out = openpyxl.load_workbook(result).active
+    return [[c.value for c in row] for row in ws_out.iter_rows()]
+
+standard = read_output(process_excel("dummy_input_stream.xlsx", "dummy_template_stream.xlsx", MAPPING_RULES))
+streaming = read_output(process_excel("dummy_input_stream.xlsx", "dummy_template_stream.xlsx", MAPPING_RULES, engine="streaming"))
+
+# Verify output
+print(f"Streaming output: {streaming}")
+assert streaming == standard
+ws_out = openpyxl.load_workbook(process_excel("dummy_input_stream.xlsx", "dummy_template_stream.xlsx", MAPPING_RULES, engine="streaming")).active
+print(f"Size: {ws_out['C3'].value}") # 500 x 3000
+print(f"Temp In (Sheet1): {ws_out['C4'].value}") # 100.5
+print(f"Temp 2 Out (Sheet2): {ws_out['D7'].value}") # Out_2
+assert ws_out["C3"].value == "500 x 3000"
+assert ws_out["C4"].value == "100.5"
+assert ws_out["D7"].value == "Out_2"
+assert ws_out["C8"].value is None
+
+# Invalid addresses are rejected up front by both engines
+for engine in ("standard", "streaming"):
+    try:
+        process_excel("dummy_input_stream.xlsx", "dummy_template_stream.xlsx",
+                      {**MAPPING_RULES, "Broken": ["NOT_A_CELL"]}, engine=engine)
+        raise AssertionError("invalid rules should be rejected")
+    except ValueError as e:
+        assert "'NOT_A_CELL' is not a valid cell address" in str(e)
+
+# A chartsheet reads as a blank column in both engines
+from openpyxl.chart import BarChart, Reference
+from engine import JobStats
+chart = BarChart()
+chart.add_data(Reference(ws1, min_col=20, min_row=20, max_row=20))
+wb_input.create_chartsheet("Chart", 1).add_chart(chart)
+wb_input.save("dummy_input_stream_chart.xlsx")
+outputs = {}
+for engine in ("standard", "streaming"):
+    stats = JobStats()
+    outputs[engine] = read_output(process_excel("dummy_input_stream_chart.xlsx", "dummy_template_stream.xlsx",
+                                                MAPPING_RULES, engine=engine, stats=stats))
+    assert stats.errors == []
+print(f"Service with a chartsheet: {outputs['streaming'][1]}")
+assert outputs["streaming"] == outputs["standard"]
+assert outputs["streaming"][1][2:] == ["Service_1", None, "Service_2"]
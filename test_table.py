@@ -0,0 +1,92 @@
+import openpyxl
+import pandas as pd
+from io import BytesIO
+from engine import export_table, extract_table, type_column
+
+# Create dummy input
+wb_input = openpyxl.Workbook()
+ws1 = wb_input.active
+ws1.title = "E-101"
+ws1["I8"] = "Service_1"
+ws1["E9"] = "500"
+ws1["N9"] = "3000"
+ws1["T13"] = "Water"
+ws1["AR13"] = "Oil"
+ws1["T20"] = 100
+ws1["AF20"] = 60
+
+ws2 = wb_input.create_sheet("E-102")
+ws2["I8"] = "Service_2"
+ws2["T20"] = 110
+wb_input.save("dummy_input_table.xlsx")
+
+MAPPING_RULES = {
+    "Service of Unit": ["I8"],
+    "Size": [ ["E9", "M9", "N9"] ],
+    "Fluid Name": ["T13", "AR13"],
+    "Temperature (In/Out)": [ {"action": "vertical", "cells": ["T20", "AF20"]} ],
+}
+
+table = extract_table("dummy_input_table.xlsx", MAPPING_RULES, engine="streaming")
+print(table.to_string())
+assert list(table.columns) == [
+    "Sheet", "Service of Unit", "Size", "Fluid Name #1", "Fluid Name #2",
+    "Temperature (In/Out) In", "Temperature (In/Out) Out",
+]
+assert list(table["Sheet"]) == ["E-101", "E-102"]
+assert table.loc[0, "Size"] == "500 3000"
+assert list(table["Temperature (In/Out) In"]) == ["100", "110"]
+assert table.loc[1, "Temperature (In/Out) Out"] == ""
+
+# Invalid addresses are rejected before the input is read
+try:
+    extract_table("dummy_input_table.xlsx", {**MAPPING_RULES, "Broken": ["NOT_A_CELL"]})
+    raise AssertionError("invalid rules should be rejected")
+except ValueError as e:
+    print(e)
+    assert "Broken (rule 1)" in str(e)
+
+# Same table with the standard engine
+assert extract_table("dummy_input_table.xlsx", MAPPING_RULES).equals(table)
+
+# CSV / Parquet export
+for fmt in ("csv", "parquet"):
+    buffer = BytesIO()
+    export_table(table, buffer, fmt)
+    buffer.seek(0)
+    loaded = pd.read_csv(buffer, keep_default_na=False, dtype=str) if fmt == "csv" else pd.read_parquet(buffer)
+    print(f"{fmt}: {loaded.shape}") # (2, 7)
+    assert loaded.shape == (2, 7)
+    assert loaded.loc[1, "Service of Unit"] == "Service_2"
+
+# Typed extraction keeps numbers, splits Merge rules and parses units
+ws2["T14"] = "1,250.5 kg/h"
+ws2["AR14"] = "-"
+ws1["T14"] = 980
+wb_input.save("dummy_input_table.xlsx")
+MAPPING_RULES["Fluid Quantity, Total"] = ["T14", "AR14"]
+typed = extract_table("dummy_input_table.xlsx", MAPPING_RULES, typed=True)
+print(typed.dtypes)
+assert list(typed.columns) == [
+    "Sheet", "Service of Unit", "Size [1]", "Size [2]", "Size [3]", "Fluid Name #1", "Fluid Name #2",
+    "Temperature (In/Out) In", "Temperature (In/Out) Out",
+    "Fluid Quantity, Total #1", "Fluid Quantity, Total #1 unit", "Fluid Quantity, Total #2",
+]
+assert typed["Size [1]"].tolist() == [500, pd.NA] and str(typed["Size [1]"].dtype) == "Int64"
+assert typed["Size [3]"].tolist() == [3000, pd.NA]
+assert typed["Fluid Quantity, Total #1"].tolist() == [980.0, 1250.5]
+assert typed["Fluid Quantity, Total #1 unit"].tolist() == [pd.NA, "kg/h"]
+assert typed["Fluid Quantity, Total #2"].tolist() == ["", "-"]  # Not numeric, kept as text
+assert typed["Temperature (In/Out) In"].sum() == 210
+assert typed["Temperature (In/Out) Out"].tolist() == [60, pd.NA]
+
+# A unit never swallows a second number
+typed = type_column(pd.Series(["500 x 3000", "12"], dtype=object))
+assert typed[0].tolist() == ["500 x 3000", "12"] and typed[1] is None
+
+# Integers past int64 keep their column as text instead of wrapping or overflowing
+for big in ("12345678901234567890", "1" * 40):
+    typed = type_column(pd.Series([big, "12"], dtype=object))
+    assert typed[0].tolist() == [big, "12"] and typed[1] is None
+typed = type_column(pd.Series(["9223372036854775807", "-12"], dtype=object))
+assert typed[0].tolist() == [2 ** 63 - 1, -12] and str(typed[0].dtype) == "Int64"
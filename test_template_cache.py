@@ -0,0 +1,39 @@
+import os
+import time
+import openpyxl
+from io import BytesIO
+from engine import TemplateCache
+
+# Create dummy template
+wb_template = openpyxl.Workbook()
+ws_temp = wb_template.active
+ws_temp["A2"] = "Service of Unit"
+wb_template.save("dummy_template_cache.xlsx")
+with open("dummy_template_cache.xlsx", "rb") as f:
+    template_bytes = f.read()
+
+cache = TemplateCache(maxsize=2)
+
+# Each load is an independent copy
+wb1 = cache.load("dummy_template_cache.xlsx")
+wb1.active["C2"] = "Filled"
+wb2 = cache.load("dummy_template_cache.xlsx")
+print(f"Second copy C2: {wb2.active['C2'].value}") # None
+assert wb2.active["C2"].value is None
+assert wb2.active["A2"].value == "Service of Unit"
+assert len(cache) == 1
+
+# Uploaded templates are keyed by content
+cache.load(BytesIO(template_bytes))
+cache.load(BytesIO(template_bytes))
+assert len(cache) == 2
+
+# A modified file gets a new entry; the LRU bound evicts the oldest
+time.sleep(0.01)
+ws_temp["A2"] = "Size"
+wb_template.save("dummy_template_cache.xlsx")
+os.utime("dummy_template_cache.xlsx", ns=(time.time_ns(), time.time_ns()))
+wb3 = cache.load("dummy_template_cache.xlsx")
+print(f"Reloaded A2: {wb3.active['A2'].value}") # Size
+assert wb3.active["A2"].value == "Size"
+assert len(cache) == 2